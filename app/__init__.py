@@ -1,13 +1,14 @@
 import os
-from flask import Flask, send_from_directory
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
 from flask_cors import CORS # Giữ lại
 from app.config import config
 from flask_migrate import Migrate
+from app.utils.db_engine import RoutingSession
 
-# Khởi tạo db và migrate
-db = SQLAlchemy()
+# Khởi tạo db và migrate (session tự chuyển sang replica trong các route read_replica)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
 def create_app(config_name=None):
@@ -20,11 +21,17 @@ def create_app(config_name=None):
     # ... (các dòng app.config của bạn ở đây) ...
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "default_secret_key")
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "default_jwt_secret")
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DEV_DATABASE_URL")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SESSION_COOKIE_SECURE"] = False
     app.config["UPLOAD_FOLDER"] = os.path.abspath(os.path.join(os.path.dirname(__file__), "uploads"))
-    app.config.from_object(config['development'])
+    config_class = config[config_name or os.getenv("FLASK_CONFIG", "default")]
+    app.config.from_object(config_class)
+    config_class.init_app(app)
+
+    # Sau reverse proxy: request.remote_addr là IP client thật (giới hạn tần suất, /metrics)
+    if app.config["PROXY_FIX_X_FOR"]:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
 
         # Lấy thư mục gốc của dự án (thư mục chứa 'app', 'run.py', 'uploads')
     base_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
@@ -35,20 +42,80 @@ def create_app(config_name=None):
     CORS(app, 
      origins=["http://localhost:5173"], 
      supports_credentials=True,
-     allow_headers=["*"]  # DÙNG DẤU SAO CHO DỄ DEBUG NHẤT
+     allow_headers=["*"],  # DÙNG DẤU SAO CHO DỄ DEBUG NHẤT
+     expose_headers=["X-Next-After-Id", "X-Total-Count"]
 )
 
     # *** ĐẢM BẢO KHÔNG CÓ @app.after_request NÀO Ở ĐÂY ***
 
     # Cho phép truy cập ảnh tĩnh trong thư mục uploads
+    from app.utils.thumbnails import thumbnails, VARIANT_DIR
+    from app.utils.http_cache import is_immutable_upload
+    from app.utils import file_serving
+
+    # ?w=<độ rộng> để lấy bản thu nhỏ gần nhất (WebP nếu trình duyệt hỗ trợ).
+    # Range, 304, bản nén sẵn và X-Accel-Redirect / X-Sendfile: xem file_serving.send_upload
     @app.route('/uploads/<filename>')
     def serve_uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        width = request.args.get('w', type=int)
+        if width:
+            accept_webp = request.accept_mimetypes['image/webp'] > 0
+            variant = thumbnails.find_variant(app.config['UPLOAD_FOLDER'], filename, width, accept_webp)
+            response = file_serving.send_upload(f"{VARIANT_DIR}/{variant[1]}" if variant else filename)
+            response.vary.add('Accept')
+        else:
+            response = file_serving.send_upload(filename)
+        # Ảnh lưu theo hash nội dung không bao giờ thay đổi: cho phép cache lâu dài
+        if is_immutable_upload(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        return response
 
-    # Khởi tạo db và migrate
+    # Khởi tạo db và migrate (engine options theo hồ sơ của môi trường)
+    from app.utils import db_engine
+    db_engine.configure_engines(app)
     db.init_app(app)
+    db_engine.init_app(app, db)
     migrate.init_app(app, db)
 
+    from app.utils.user_cache import user_cache
+    user_cache.init_app(app)
+
+    from app.utils.token_versions import token_versions
+    token_versions.init_app(app)
+
+    from app.utils.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    from app.utils.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+
+    from app.utils.public_cache import public_courses_cache
+    public_courses_cache.init_app(app)
+
+    from app.utils.grading import answer_key_cache
+    answer_key_cache.init_app(app)
+
+    from app.utils import uploads
+    uploads.init_app(app)
+
+    thumbnails.init_app(app)
+    file_serving.init_app(app)
+
+    from app.utils import chunked_uploads
+    chunked_uploads.init_app(app)
+
+    from app.utils.search import search_index
+    search_index.init_app(app)
+
+    from app.utils.history_buffer import history_buffer
+    history_buffer.init_app(app)
+
+    from app.utils import rollups
+    rollups.init_app(app)
+
     # Đăng ký các blueprint
     from app.auth import auth_bp
     app.register_blueprint(auth_bp)
@@ -62,6 +129,34 @@ def create_app(config_name=None):
     from app.admin import admin_bp
     app.register_blueprint(admin_bp)
 
+    from app.routes.study import study_bp
+    app.register_blueprint(study_bp)
+
+    from app.routes.search import search_bp
+    app.register_blueprint(search_bp)
+
+    from app.routes.activity import activity_bp
+    app.register_blueprint(activity_bp)
+
+    from app.routes.favorites import favorites_bp
+    app.register_blueprint(favorites_bp, url_prefix="/api")
+
+    from app.routes.history import history_bp
+    app.register_blueprint(history_bp, url_prefix="/api")
+
+    from app.routes.uploads import uploads_bp
+    app.register_blueprint(uploads_bp)
+
+    # Số liệu theo endpoint + số liệu của các cache / pool ở /metrics
+    from app.utils.metrics import request_metrics
+    from app.utils.db_engine import pool_stats
+    request_metrics.init_app(app, db)
+    request_metrics.register_stats("user_cache", user_cache.stats)
+    request_metrics.register_stats("password_hasher", password_hasher.stats)
+    request_metrics.register_stats("rate_limiter", rate_limiter.stats)
+    request_metrics.register_stats("db_pool", lambda: pool_stats(db))
+    request_metrics.register_stats("history_buffer", history_buffer.stats)
+
     # Log REDIRECT_URI nếu có dùng OAuth
     from app.utils.oauth import REDIRECT_URI
     app.logger.info(f"🔁 REDIRECT URI đang dùng: {REDIRECT_URI}")
@@ -1,11 +1,67 @@
 # app/admin.py
 
-from flask import Blueprint, jsonify, request
-from app.models import db, User, Course
+from flask import Blueprint, jsonify, request, current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
+from app.models import db, User, Course, CardReview
 from app.auth import token_required  # middleware JWT
+from app.utils.user_cache import user_cache
+from app.utils.token_versions import token_versions
+from app.utils.public_cache import public_courses_cache
+from app.utils.grading import answer_key_cache
+from app.utils.uploads import release
+from app.utils.cards import delete_card_reviews
+from app.utils.cascade import delete_course_rows, delete_user_rows
+from app.utils.search import search_index
+from app.utils.streaming import parse_page_args
+from app.utils.db_engine import pool_stats
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 
+# --- Serialize user cho admin: số truy vấn cố định, không phụ thuộc số user ---
+ADMIN_USER_FIELDS = ("id", "username", "email", "name", "role", "courses")
+
+def _parse_user_fields():
+    raw = request.args.get("fields")
+    if not raw:
+        return ADMIN_USER_FIELDS, None
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [f for f in fields if f not in ADMIN_USER_FIELDS]
+    if unknown or not fields:
+        return None, f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields specified"
+    return fields, None
+
+def _paginate_users(fields):
+    page, per_page = parse_page_args(
+        request, current_app.config["ADMIN_PAGE_SIZE"], current_app.config["ADMIN_MAX_PAGE_SIZE"]
+    )
+
+    # Chỉ nạp các cột được yêu cầu (id luôn cần để ghép courses)
+    columns = [getattr(User, f) for f in fields if f != "courses"]
+    query = User.query.options(load_only(User.id, *columns)).order_by(User.id)
+    users = query.offset((page - 1) * per_page).limit(per_page).all()
+    pagination = {"page": page, "per_page": per_page, "total": User.query.count()}
+    return users, pagination
+
+def _load_courses_by_owner(users):
+    # Một truy vấn cho toàn bộ courses của trang, gom theo owner_id
+    courses_by_owner = {}
+    if not users:
+        return courses_by_owner
+    owner_ids = [u.id for u in users]
+    for course in Course.query.filter(Course.owner_id.in_(owner_ids)).order_by(Course.id).all():
+        courses_by_owner.setdefault(course.owner_id, []).append(course.to_dict())
+    return courses_by_owner
+
+def _serialize_users(users, fields, courses_by_owner):
+    result = []
+    for user in users:
+        item = {f: getattr(user, f) for f in fields if f != "courses"}
+        if "courses" in fields:
+            item["courses"] = courses_by_owner.get(user.id, [])
+        result.append(item)
+    return result
+
 # DASHBOARD
 @admin_bp.route("/dashboard-data", methods=["GET"])
 @token_required
@@ -13,17 +69,29 @@ def get_dashboard_data(current_user):
     if current_user.role != "ADMIN":
         return jsonify({"error": "Admin access required"}), 403
 
-    all_users = User.query.all()
-    all_courses = Course.query.all()
+    fields, error = _parse_user_fields()
+    if error:
+        return jsonify({"error": error}), 400
 
-    users_list = [user.to_dict() for user in all_users]
-    courses_list = [course.to_dict() for course in all_courses]
+    users, pagination = _paginate_users(fields)
+    courses_by_owner = _load_courses_by_owner(users)
+    pagination["total_courses"] = Course.query.count()
 
+    # "courses" là các khóa học của những user trong trang hiện tại
     return jsonify({
-        "users": users_list,
-        "courses": courses_list
+        "users": _serialize_users(users, fields, courses_by_owner),
+        "courses": [c for owner_courses in courses_by_owner.values() for c in owner_courses],
+        "pagination": pagination
     })
 
+# TRẠNG THÁI CONNECTION POOL (thời gian chờ checkout, số connection đang dùng)
+@admin_bp.route("/db-pool", methods=["GET"])
+@token_required
+def get_db_pool_stats(current_user):
+    if current_user.role != "ADMIN":
+        return jsonify({"error": "Admin access required"}), 403
+    return jsonify(pool_stats(db))
+
 # GET USERS
 @admin_bp.route("/users", methods=["GET"])
 @token_required
@@ -31,8 +99,16 @@ def get_users(current_user):
     if current_user.role != "ADMIN":
         return jsonify({"error": "Admin access required"}), 403
 
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    fields, error = _parse_user_fields()
+    if error:
+        return jsonify({"error": error}), 400
+
+    users, pagination = _paginate_users(fields)
+    courses_by_owner = _load_courses_by_owner(users) if "courses" in fields else {}
+
+    response = jsonify(_serialize_users(users, fields, courses_by_owner))
+    response.headers["X-Total-Count"] = str(pagination["total"])
+    return response
 
 # BAN / UNBAN USER
 @admin_bp.route("/users/<int:user_id>/ban", methods=["PUT"])
@@ -49,7 +125,9 @@ def toggle_user_ban(current_user, user_id):
         return jsonify({"error": "Cannot ban admin"}), 403
 
     user.role = "BANNED" if user.role != "BANNED" else "USER"
+    token_versions.bump(user)
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify({"message": f"User role set to {user.role}"})
 
 # DELETE COURSE
@@ -63,8 +141,14 @@ def delete_course_by_admin(current_user, course_id):
     if not course:
         return jsonify({"error": "Course not found"}), 404
 
+    release(course.image)
+    delete_card_reviews(CardReview.course_id == course.id)
+    delete_course_rows([course.id])
     db.session.delete(course)
     db.session.commit()
+    public_courses_cache.invalidate()
+    answer_key_cache.invalidate(course_id)
+    search_index.remove_course(course_id)
     return jsonify({"message": "Course deleted by admin"})
 
 @admin_bp.route("/users/<int:user_id>", methods=["PUT"])
@@ -98,12 +182,15 @@ def update_user_by_admin(current_user, user_id):
     # Chỉ cho phép thay đổi vai trò nếu người dùng không phải là Admin
     if role and user_to_update.role != "ADMIN":
         if role in ["USER", "BANNED"]: # Các vai trò được phép
+             if role != user_to_update.role:
+                 token_versions.bump(user_to_update)
              user_to_update.role = role
         else:
             return jsonify({"error": "Invalid role specified"}), 400
 
     try:
         db.session.commit()
+        user_cache.invalidate(user_to_update.id)
         # Làm mới đối tượng user sau khi commit để đảm bảo dữ liệu là mới nhất
         db.session.refresh(user_to_update)
         return jsonify({
@@ -134,6 +221,21 @@ def delete_user_by_admin(current_user, user_id):
     if user_to_delete.role == "ADMIN":
         return jsonify({"error": "Cannot delete an admin account"}), 403
 
+    # Khóa học của user bị xóa theo (cascade), nhả ảnh của chúng trước
+    owned = db.session.query(Course.id, Course.image).filter_by(owner_id=user_id).all()
+    for _, image in owned:
+        release(image)
+    delete_card_reviews(or_(
+        CardReview.user_id == user_id,
+        CardReview.course_id.in_([course_id for course_id, _ in owned]),
+    ))
+    delete_course_rows(course_id for course_id, _ in owned)
+    delete_user_rows(user_id)
     db.session.delete(user_to_delete)
     db.session.commit()
+    search_index.remove_courses([course_id for course_id, _ in owned])
+    user_cache.invalidate(user_id)
+    token_versions.revoke(user_id)
+    public_courses_cache.invalidate()  # Các khóa học của user cũng bị xóa theo
+    answer_key_cache.clear()
     return jsonify({"message": "User deleted successfully"})
\ No newline at end of file
@@ -2,31 +2,83 @@ import os
 import datetime
 import jwt
 from flask import Blueprint, request, jsonify, session, redirect, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import db, User
 from app.utils.oauth import get_google_flow
+from app.utils.user_cache import user_cache, CachedUser
+from app.utils.token_versions import token_versions
+from app.utils.passwords import password_hasher, HasherBusy
+from app.utils.rate_limit import rate_limiter, rate_limited
 from googleapiclient.discovery import build
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+# --- Hàng đợi băm mật khẩu đầy: báo client thử lại sau ---
+@auth_bp.errorhandler(HasherBusy)
+def handle_hasher_busy(e):
+    response = jsonify({"error": "Máy chủ đang bận, vui lòng thử lại sau"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+# --- Khóa ký JWT, chuyển sang bytes một lần cho mỗi giá trị secret ---
+def _signing_key():
+    secret = current_app.config["JWT_SECRET_KEY"]
+    cached = current_app.extensions.get("jwt_signing_key")
+    if cached is None or cached[0] != secret:
+        cached = (secret, secret.encode("utf-8"))
+        current_app.extensions["jwt_signing_key"] = cached
+    return cached[1]
+
 # --- Tạo JWT Token ---
-def generate_token(user_id):
+# Token mang sẵn role và phiên bản token ("tv") để token_required không phải truy vấn user
+def generate_token(user):
     payload = {
-        "user_id": user_id,
+        "user_id": user.id,
+        "role": user.role,
+        "username": user.username,
+        "tv": user.token_version or 0,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)  # Token hết hạn sau 1 giờ
     }
-    secret = current_app.config["JWT_SECRET_KEY"]
-    return jwt.encode(payload, secret, algorithm="HS256")
+    return jwt.encode(payload, _signing_key(), algorithm="HS256")
 
 # --- Tạo Refresh Token ---
-def generate_refresh_token(user_id):
+def generate_refresh_token(user):
     refresh_payload = {
-        "user_id": user_id,
+        "user_id": user.id,
+        "tv": user.token_version or 0,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(days=7)  # Refresh token có thời gian sống 7 ngày
     }
-    secret = current_app.config["JWT_SECRET_KEY"]
-    return jwt.encode(refresh_payload, secret, algorithm="HS256")
+    return jwt.encode(refresh_payload, _signing_key(), algorithm="HS256")
+
+# --- Xác thực token trong header Authorization, trả về (current_user, lỗi) ---
+def _authenticate_request(token):
+    try:
+        token = token.split(" ")[1]
+        data = jwt.decode(token, _signing_key(), algorithms=["HS256"])
+        # Token mới: role nằm trong claim, chỉ cần đối chiếu phiên bản token trong bộ nhớ
+        if "tv" in data and "role" in data:
+            if not token_versions.is_current(data['user_id'], data['tv']):
+                current_app.logger.error("Token has been revoked!")
+                return None, (jsonify({"message": "Token has been revoked!"}), 403)
+            return CachedUser(id=data['user_id'], role=data['role'], username=data.get('username')), None
+        # Token cũ (chỉ có user_id): ưu tiên lấy user từ cache, chỉ truy vấn DB khi cache miss
+        current_user = user_cache.get(data['user_id'])
+        if current_user is None:
+            user = User.query.filter_by(id=data['user_id']).first()
+            if not user:
+                current_app.logger.error("User not found in database for token!")
+                return None, (jsonify({"message": "User not found!"}), 403)
+            current_user = user_cache.set(user)
+    except jwt.ExpiredSignatureError:
+        current_app.logger.error("Token has expired!")
+        return None, (jsonify({"message": "Token has expired!"}), 403)
+    except jwt.InvalidTokenError:
+        current_app.logger.error("Invalid token!")
+        return None, (jsonify({"message": "Invalid token!"}), 403)
+    except Exception as e:
+        current_app.logger.error(f"Error decoding token: {str(e)}")
+        return None, (jsonify({"message": f"Token error: {str(e)}"}), 403)
+    return current_user, None
 
 # --- Decorator kiểm tra Token ---
 def token_required(f):
@@ -36,28 +88,29 @@ def token_required(f):
         if not token:
             current_app.logger.error("Token is missing!")
             return jsonify({"message": "Token is missing!"}), 403
-        try:
-            token = token.split(" ")[1]
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.filter_by(id=data['user_id']).first()
-            if not current_user:
-                current_app.logger.error("User not found in database for token!")
-                return jsonify({"message": "User not found!"}), 403
-        except jwt.ExpiredSignatureError:
-            current_app.logger.error("Token has expired!")
-            return jsonify({"message": "Token has expired!"}), 403
-        except jwt.InvalidTokenError:
-            current_app.logger.error("Invalid token!")
-            return jsonify({"message": "Invalid token!"}), 403
-        except Exception as e:
-            current_app.logger.error(f"Error decoding token: {str(e)}")
-            return jsonify({"message": f"Token error: {str(e)}"}), 403
+        current_user, error = _authenticate_request(token)
+        if error:
+            return error
         
         return f(current_user, *args, **kwargs)
     return decorated_function
 
+# --- Decorator cho route công khai: current_user là None nếu không gửi token ---
+def token_optional(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return f(None, *args, **kwargs)
+        current_user, error = _authenticate_request(token)
+        if error:
+            return error
+        return f(current_user, *args, **kwargs)
+    return decorated_function
+
 # --- Đăng ký người dùng ---
 @auth_bp.route('/register', methods=['POST'])
+@rate_limited("register")
 def register():
     data = request.get_json()
     username = data.get("username")
@@ -67,7 +120,7 @@ def register():
     if User.query.filter_by(username=username).first():
         return jsonify({"error": "Username đã tồn tại"}), 409
 
-    hashed_pw = generate_password_hash(password)
+    hashed_pw = password_hasher.hash(password)
     new_user = User(username=username, password=hashed_pw, name=name, role="USER")
 
     db.session.add(new_user)
@@ -77,6 +130,7 @@ def register():
 
 # --- Đăng nhập thường ---
 @auth_bp.route('/login', methods=['POST'])
+@rate_limited("login")
 def login():
     data = request.get_json()
     username = data.get("username")
@@ -84,14 +138,28 @@ def login():
 
     user = User.query.filter_by(username=username).first()
 
-    if not user or not check_password_hash(user.password, password):
+    if not user or not password_hasher.verify(user.password, password):
         return jsonify({"error": "Tài khoản hoặc mật khẩu không đúng"}), 401
 
     if user.role == "BANNED":
         return jsonify({"error": "Tài khoản của bạn đã bị khóa. Vui lòng liên hệ quản trị viên."}), 403
 
-    access_token = generate_token(user.id)
-    refresh_token = generate_refresh_token(user.id)  # Tạo refresh token
+    # Băm lại mật khẩu nếu hash đang dùng tham số cũ (bỏ qua nếu hàng đợi đang đầy)
+    if password_hasher.needs_rehash(user.password):
+        try:
+            user.password = password_hasher.hash(password)
+            db.session.commit()
+        except HasherBusy:
+            pass
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to rehash password for user {user.id}: {str(e)}")
+
+    # Đăng nhập đúng thì xóa bộ đếm theo username, chỉ các lần sai liên tiếp mới bị chặn
+    rate_limiter.reset("login", "username", username)
+
+    access_token = generate_token(user)
+    refresh_token = generate_refresh_token(user)  # Tạo refresh token
 
     return jsonify({
         "message": "Đăng nhập thành công",
@@ -141,7 +209,7 @@ def google_callback():
         user.name = name
         db.session.commit()
 
-    token = generate_token(user.id)
+    token = generate_token(user)
 
     redirect_uri = (
         f"http://localhost:5173/auth/callback"
@@ -180,26 +248,34 @@ def update_profile(current_user):
         user.username = username
 
     if password:
-        user.password = generate_password_hash(password)
+        user.password = password_hasher.hash(password)
 
     if name:
         user.name = name
 
     user.oauth_login = False  # Cho phép đăng nhập truyền thống sau khi cập nhật
     db.session.commit()
+    user_cache.invalidate(user.id)
 
     return jsonify({"message": "Cập nhật thành công"}), 200
 
 # --- Cập nhật refresh token ---
 @auth_bp.route('/refresh-token', methods=['POST'])
+@rate_limited("refresh")
 def refresh_token():
     refresh_token = request.json.get('refresh_token')
     if not refresh_token:
         return jsonify({"error": "Refresh token is required"}), 400
     
     try:
-        data = jwt.decode(refresh_token, current_app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-        new_access_token = generate_token(data['user_id'])  # Cấp lại access token
+        data = jwt.decode(refresh_token, _signing_key(), algorithms=["HS256"])
+        # Đọc lại user để token mới mang role hiện tại
+        user = User.query.get(data['user_id'])
+        if not user or data.get('tv', 0) != (user.token_version or 0):
+            return jsonify({"error": "Refresh token has been revoked"}), 401
+        if user.role == "BANNED":
+            return jsonify({"error": "Tài khoản của bạn đã bị khóa. Vui lòng liên hệ quản trị viên."}), 403
+        new_access_token = generate_token(user)  # Cấp lại access token
         return jsonify({"access_token": new_access_token}), 200
     except jwt.ExpiredSignatureError:
         return jsonify({"error": "Refresh token has expired"}), 401
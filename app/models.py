@@ -1,5 +1,6 @@
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 from app import db  # ✅ import db từ __init__.py
 
 # Model User
@@ -13,6 +14,8 @@ class User(db.Model, UserMixin):
     password = db.Column(db.String(512))
     role = db.Column(db.String(20), default="USER")
     oauth_login = db.Column(db.Boolean, default=False)
+    # Tăng khi khóa tài khoản / đổi quyền để vô hiệu hóa các token đã cấp
+    token_version = db.Column(db.Integer, default=0, nullable=False)
     courses = db.relationship(
         'Course', 
         backref=db.backref('owner', lazy='select'),
@@ -48,6 +51,16 @@ class Course(db.Model):
     favorites = db.relationship("Favorite", backref="course", lazy=True)
     history = db.relationship("StudyHistory", backref="course", lazy=True)
     is_published = db.Column(db.Boolean, default=False, nullable=False)
+    # Tăng ở mọi thao tác ghi lên course hoặc card của nó, dùng làm ETag
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Phục vụ phân trang keyset cho danh sách quiz công khai
+    __table_args__ = (db.Index('ix_courses_is_published_id', 'is_published', 'id'),)
+
+    def touch(self):
+        self.version = (self.version or 0) + 1
+        self.updated_at = datetime.utcnow()
+
     def to_dict(self):
         # CHẮC CHẮN RẰNG KHÔNG CÓ favorites hay history ở đây
         return {
@@ -68,6 +81,18 @@ class Card(db.Model):
     front = db.Column(db.Text)
     back = db.Column(db.Text)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
+    content_hash = db.Column(db.String(40))  # sha1(front, back), dùng cho publish kiểu diff
+    # Dữ liệu câu hỏi dạng có cấu trúc ('back' vẫn giữ bản JSON cho frontend cũ)
+    question_type = db.Column(db.String(30))
+    options = db.Column(db.JSON)
+    correct_answer = db.Column(db.Text)
+    # Thứ tự câu hỏi trong khóa học (publish ghi lại; id chỉ là thứ tự chèn)
+    position = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    __table_args__ = (
+        db.Index('ix_cards_course_id_content_hash', 'course_id', 'content_hash'),
+        db.Index('ix_cards_course_id_question_type', 'course_id', 'question_type'),
+        db.Index('ix_cards_course_id_position', 'course_id', 'position'),
+    )
 
     def to_dict(self):
         return {
@@ -75,9 +100,46 @@ class Card(db.Model):
             "front": self.front,
             "back": self.back,
             "course_id": self.course_id,
+            "type": self.question_type,
+            "options": self.options or [],
+            "correctAnswer": self.correct_answer or "",
     }
 
 
+# Model Upload: ảnh lưu theo hash nội dung, đếm số khóa học đang dùng
+class Upload(db.Model):
+    __tablename__ = 'uploads'
+    filename = db.Column(db.String(100), primary_key=True)  # <sha256><ext>
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Model UploadSession: upload chia chunk đang dở; dữ liệu nằm ở UPLOAD_FOLDER/.partial/<id>
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    extension = db.Column(db.String(10), nullable=False)  # ".png"...
+    size = db.Column(db.Integer, nullable=False)  # Tổng số byte khai báo lúc init, tính vào quota
+    content_hash = db.Column(db.String(64))  # sha256, có sau khi finalize
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (db.Index('ix_upload_sessions_user_id', 'user_id'),)
+
+# Model CardReview: trạng thái ôn tập giãn cách (SM-2) của một user với một card
+class CardReview(db.Model):
+    __tablename__ = 'card_reviews'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    card_id = db.Column(db.Integer, db.ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)
+    interval = db.Column(db.Integer, default=0, nullable=False)  # Số ngày
+    ease = db.Column(db.SmallInteger, default=2500, nullable=False)  # Hệ số dễ x1000
+    reps = db.Column(db.SmallInteger, default=0, nullable=False)
+    lapses = db.Column(db.SmallInteger, default=0, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime)
+    # Lấy card đến hạn bằng một lần quét khoảng trên chỉ mục
+    __table_args__ = (db.Index('ix_card_reviews_user_id_due_at', 'user_id', 'due_at'),)
+
 # Model Progress
 class Progress(db.Model):
     __tablename__ = 'progress'
@@ -86,6 +148,8 @@ class Progress(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
     studied = db.Column(db.Integer, default=0)
     correct = db.Column(db.Integer, default=0)
+    # Mỗi (user, course) chỉ có một dòng, để ghi bằng upsert
+    __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='_progress_user_course_uc'),)
 
 # Model Favorite
 class Favorite(db.Model):
@@ -93,7 +157,11 @@ class Favorite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
-    __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='_user_course_uc'),)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_id', name='_user_course_uc'),
+        db.Index('ix_favorites_user_id', 'user_id'),
+    )
 
 # Model StudyHistory
 class StudyHistory(db.Model):
@@ -102,4 +170,29 @@ class StudyHistory(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     studied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_study_history_user_id_studied_at', 'user_id', 'studied_at'),)
+
+# Model StudyRollup: số lượt học gộp theo (user, course, ngày UTC); study_history cũ được nén vào đây
+class StudyRollup(db.Model):
+    __tablename__ = 'study_daily_rollups'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    events = db.Column(db.Integer, default=0, nullable=False)
+    # Heatmap / streak của một user: quét khoảng theo ngày
+    __table_args__ = (db.Index('ix_study_daily_rollups_user_id_day', 'user_id', 'day'),)
+
+# BLOB của MySQL chỉ chứa được 64KB, không đủ cho quiz lớn
+_SnapshotBlob = db.LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql')
+
+# Model QuizSnapshot: JSON đã serialize sẵn (kèm bản gzip) của quiz đã xuất bản, ứng với Course.version
+class QuizSnapshot(db.Model):
+    __tablename__ = 'quiz_snapshots'
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    details = db.Column(_SnapshotBlob, nullable=False)
+    details_gzip = db.Column(_SnapshotBlob, nullable=False)
+    questions = db.Column(_SnapshotBlob, nullable=False)
+    questions_gzip = db.Column(_SnapshotBlob, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -0,0 +1,20 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.auth import token_required
+from app.utils.rollups import activity_summary
+from app.utils.history_buffer import history_buffer
+
+activity_bp = Blueprint("activity", __name__)
+
+@activity_bp.route("/api/me/activity", methods=["GET"])
+@token_required
+def get_my_activity(current_user):
+    """
+    Heatmap số lượt học theo ngày (UTC) và streak của người dùng (?days=, ?course_id=).
+    """
+    days = request.args.get("days", current_app.config["ACTIVITY_DEFAULT_DAYS"], type=int)
+    days = max(1, min(days, current_app.config["ACTIVITY_MAX_DAYS"]))
+    course_id = request.args.get("course_id", type=int)
+    # Rollup được cộng khi bộ đệm lịch sử ghi lô: ghi nốt các lượt học vừa gửi của user này
+    if history_buffer.has_pending(current_user.id):
+        history_buffer.flush()
+    return jsonify(activity_summary(current_user.id, days, course_id))
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_login import current_user
-from app.models import db, User, Course, Card  # Đổi Deck thành Course
+from app.models import db, User, Course, Card, CardReview  # Đổi Deck thành Course
+from app.utils.cards import delete_card_reviews
+from app.utils.cascade import delete_course_rows
+from app.utils.uploads import release
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -61,7 +64,10 @@ def delete_course_by_admin(course_id):
         return jsonify({"error": "Course not found"}), 404
 
     # Xoá thẻ trước rồi xoá course
+    delete_card_reviews(CardReview.course_id == course.id)
+    delete_course_rows([course.id])
     Card.query.filter_by(course_id=course.id).delete()
+    release(course.image)
     db.session.delete(course)
     try:
         db.session.commit()
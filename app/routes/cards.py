@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_login import current_user
-from app.models import db, Card, Course  # Đổi Deck thành Course
+from app.models import db, Card, CardReview, Course  # Đổi Deck thành Course
+from app.utils.cards import card_content_hash, typed_fields_from_back, delete_card_reviews
+from app.utils.grading import answer_key_cache
+from app.utils.search import search_index
 
 cards_bp = Blueprint("cards", __name__)
 
@@ -21,6 +24,11 @@ def update_card(card_id):
     data = request.json or {}
     card.front = data.get("front", card.front)
     card.back = data.get("back", card.back)
+    if "back" in data:
+        for field, value in typed_fields_from_back(card.back).items():
+            setattr(card, field, value)
+    card.content_hash = card_content_hash(card.front, card.back)
+    course.touch()
 
     try:
         db.session.commit()
@@ -28,6 +36,8 @@ def update_card(card_id):
         db.session.rollback()
         return jsonify({"error": "Database error", "details": str(e)}), 500
 
+    answer_key_cache.invalidate(course.id)
+    search_index.reindex_course(course.id)
     return jsonify({"message": "Card updated", "card_id": card.id})
 
 # Xóa card
@@ -45,10 +55,14 @@ def delete_card(card_id):
         return jsonify({"error": "Unauthorized"}), 403
 
     try:
+        delete_card_reviews(CardReview.card_id == card.id)
         db.session.delete(card)
+        course.touch()
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Database error", "details": str(e)}), 500
 
+    answer_key_cache.invalidate(course.id)
+    search_index.reindex_course(course.id)
     return jsonify({"message": "Card deleted"})
@@ -1,12 +1,50 @@
-import os
 import json # Import json để xử lý dữ liệu options
+import os
 from flask import Blueprint, request, jsonify, current_app
-from app.models import db, Course, Card
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import select
+from app.models import db, Course, Card, CardReview
 from app.auth import token_required
-from werkzeug.utils import secure_filename
+from app.utils.public_cache import public_courses_cache
+from app.utils.grading import answer_key_cache
+from app.utils.cards import (
+    build_card_rows, card_content_hash, diff_cards, replace_cards, load_course_cards, delete_card_reviews,
+    next_card_position,
+)
+from app.utils.cascade import delete_course_rows
+from app.utils.uploads import save_upload, release, UploadError
+from app.utils.chunked_uploads import attach_upload
+from app.utils.http_cache import course_etag, owner_or_admin, owner_only
+from app.utils.search import search_index
+from app.utils.importer import detect_format, iter_csv_rows, iter_jsonl_rows, import_cards
+from app.utils.export import EXPORT_FORMATS, iter_export_rows, export_lines, export_response
+from app.utils.quiz_snapshots import publish_snapshot
 
 courses_bp = Blueprint("courses", __name__)
 
+@courses_bp.errorhandler(RequestEntityTooLarge)
+def handle_too_large(e):
+    return jsonify({"error": "Request body is too large, upload large images via /api/uploads"}), 413
+
+
+def _course_image(current_user):
+    """
+    Ảnh gửi kèm form: upload_id của một upload chia chunk đã finalize (/api/uploads),
+    hoặc file "image" gửi thẳng trong multipart. Trả về None nếu không có ảnh. Không commit.
+    """
+    upload_id = request.form.get("upload_id")
+    if upload_id:
+        return attach_upload(upload_id, current_user.id)
+    image = request.files.get("image")
+    if image:
+        # Lưu theo hash nội dung; URL trả về không chứa đường dẫn tuyệt đối của server
+        return save_upload(image)
+    return None
+
+def _upload_error(e):
+    db.session.rollback()
+    return jsonify(dict(e.details, error=str(e))), e.status
+
 # --- ROUTES CHO KHÓA HỌC (COURSES) ---
 
 @courses_bp.route("/api/courses", methods=["POST"])
@@ -18,19 +56,7 @@ def create_course(current_user):
 
         name = request.form.get("name")
         description = request.form.get("description", "")
-        image = request.files.get("image")
-        image_url = None
-
-        if image:
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            
-            filename = secure_filename(image.filename)
-            image_path = os.path.join(upload_folder, filename)
-            image.save(image_path)
-            # Lưu ý: URL trả về cho client không nên chứa đường dẫn tuyệt đối của server
-            image_url = f"uploads/{filename}"
+        image_url = _course_image(current_user)
 
         new_course = Course(
             name=name, 
@@ -40,8 +66,13 @@ def create_course(current_user):
         )
         db.session.add(new_course)
         db.session.commit()
+        search_index.reindex_course(new_course.id)
 
         return jsonify({"message": "Course created successfully", "course": new_course.to_dict()}), 201
+    except UploadError as e:
+        return _upload_error(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error creating course: {str(e)}")
@@ -53,7 +84,6 @@ def get_courses(current_user):
     try:
         # ĐÂY LÀ DÒNG ĐÚNG: Lọc theo owner_id của người dùng hiện tại
         courses = Course.query.filter_by(owner_id=current_user.id).order_by(Course.id.desc()).all()
-        print(f"--- MY COURSES DEBUG: Found {len(courses)} courses for user {current_user.id}. ---")
         return jsonify([c.to_dict() for c in courses])
     except Exception as e:
         current_app.logger.error(f"Error getting courses for user {current_user.id}: {str(e)}")
@@ -61,6 +91,7 @@ def get_courses(current_user):
 
 @courses_bp.route("/api/courses/<int:course_id>", methods=["GET"])
 @token_required
+@course_etag("course", owner_or_admin)
 def get_course(current_user, course_id):
     course = None
     # Nếu là admin thì không cần kiểm tra owner_id
@@ -74,15 +105,69 @@ def get_course(current_user, course_id):
     # Lấy dữ liệu của course dưới dạng dictionary
     course_data = course.to_dict() 
     
-    # Lấy tất cả các card (câu hỏi) thuộc về course này
-    cards = Card.query.filter_by(course_id=course.id).all()
-    
-    # Thêm danh sách các card đã được chuyển thành dictionary vào course_data
-    course_data['cards'] = [card.to_dict() for card in cards]
+    # Lấy tất cả các card (câu hỏi) thuộc về course này, đã giải mã sẵn
+    course_data['cards'] = load_course_cards(course.id)
     
     # Trả về object JSON hoàn chỉnh
     return jsonify(course_data)
 
+def _parse_export_args():
+    export_format = (request.args.get("format") or "jsonl").lower()
+    if export_format not in EXPORT_FORMATS:
+        return None, None, "Unsupported export format, use jsonl or csv"
+    with_images = request.args.get("images", "").lower() in ("1", "true", "yes")
+    return export_format, with_images, None
+
+@courses_bp.route("/api/courses/<int:course_id>/export", methods=["GET"])
+@token_required
+def export_course(current_user, course_id):
+    """
+    Xuất các câu hỏi của khóa học dưới dạng stream (?format=jsonl|csv, ?images=1 để đóng gói kèm ảnh thành zip).
+    """
+    export_format, with_images, error = _parse_export_args()
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = db.session.query(Course.id, Course.image).filter(Course.id == course_id)
+    if current_user.role != "ADMIN":
+        query = query.filter(Course.owner_id == current_user.id)
+    course = query.first_or_404()
+
+    rows = iter_export_rows(Course.id == course.id, current_app.config["EXPORT_YIELD_PER"])
+    image_names = [os.path.basename(course.image)] if course.image else []
+    return export_response(
+        f"course-{course.id}", export_format, export_lines(rows, export_format),
+        image_names if with_images else None,
+    )
+
+@courses_bp.route("/api/me/export", methods=["GET"])
+@token_required
+def export_my_library(current_user):
+    """
+    Xuất toàn bộ khóa học và câu hỏi của người dùng hiện tại dưới dạng stream.
+    """
+    export_format, with_images, error = _parse_export_args()
+    if error:
+        return jsonify({"error": error}), 400
+
+    yield_per = current_app.config["EXPORT_YIELD_PER"]
+    rows = iter_export_rows(Course.owner_id == current_user.id, yield_per)
+    user_id = current_user.id
+
+    def image_names():
+        # Chỉ chạy truy vấn ảnh sau khi đã đọc hết cursor dữ liệu (một connection, một cursor mở)
+        images = db.session.execute(
+            select(Course.image).where(Course.owner_id == user_id, Course.image.isnot(None))
+            .distinct().execution_options(yield_per=yield_per)
+        ).scalars()
+        for image in images:
+            yield os.path.basename(image)
+
+    return export_response(
+        f"library-{user_id}", export_format, export_lines(rows, export_format, library=True),
+        image_names() if with_images else None,
+    )
+
 @courses_bp.route("/api/courses/<int:course_id>", methods=["PUT"])
 @token_required
 def update_course(current_user, course_id):
@@ -91,28 +176,29 @@ def update_course(current_user, course_id):
     try:
         name = request.form.get("name")
         description = request.form.get("description")
-        image = request.files.get("image")
+        image_url = _course_image(current_user)
 
         if name:
             course.name = name
         if description is not None:
             course.description = description
         
-        if image:
-            # Xử lý upload ảnh mới (tương tự create_course)
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            # (Tùy chọn) Xóa ảnh cũ
-            if course.image:
-                old_image_path = os.path.join(upload_folder, os.path.basename(course.image))
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-
-            filename = secure_filename(image.filename)
-            image.save(os.path.join(upload_folder, filename))
-            course.image = f"uploads/{filename}"
+        if image_url:
+            # Ảnh mới (tương tự create_course); ảnh cũ chỉ bị xóa khi không còn khóa học nào dùng
+            old_image = course.image
+            course.image = image_url
+            release(old_image)
 
+        course.touch()
         db.session.commit()
+        if course.is_published:
+            public_courses_cache.invalidate()
+        search_index.reindex_course(course.id)
         return jsonify({"message": "Course updated successfully", "course": course.to_dict()})
+    except UploadError as e:
+        return _upload_error(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error updating course {course_id}: {str(e)}")
@@ -124,9 +210,15 @@ def update_course(current_user, course_id):
 def delete_course(current_user, course_id):
     course = Course.query.filter_by(id=course_id, owner_id=current_user.id).first_or_404()
     try:
+        delete_card_reviews(CardReview.course_id == course.id)
+        delete_course_rows([course.id])
         Card.query.filter_by(course_id=course.id).delete()
+        release(course.image)
         db.session.delete(course)
         db.session.commit()
+        public_courses_cache.invalidate()
+        answer_key_cache.invalidate(course_id)
+        search_index.remove_course(course_id)
         return jsonify({"message": "Course deleted successfully"})
     except Exception as e:
         db.session.rollback()
@@ -160,12 +252,20 @@ def add_card_to_course(current_user, course_id):
     new_card = Card(
         front=question_text, 
         back=back_content_json, # Lưu chuỗi JSON vào trường back
-        course_id=course.id
+        course_id=course.id,
+        content_hash=card_content_hash(question_text, back_content_json),
+        question_type=question_type,
+        options=back_content_data.get('options', []),
+        correct_answer=back_content_data.get('correctAnswer', ''),
+        position=next_card_position(course.id)
     )
     
     try:
         db.session.add(new_card)
+        course.touch()
         db.session.commit()
+        answer_key_cache.invalidate(course.id)
+        search_index.reindex_course(course.id)
         return jsonify({"message": "Card added successfully", "card": new_card.to_dict()}), 201
     except Exception as e:
         db.session.rollback()
@@ -175,10 +275,52 @@ def add_card_to_course(current_user, course_id):
 
 @courses_bp.route("/api/courses/<int:course_id>/cards", methods=["GET"])
 @token_required
+@course_etag("cards", owner_only)
 def get_cards_for_course(current_user, course_id):
     course = Course.query.filter_by(id=course_id, owner_id=current_user.id).first_or_404()
-    cards = Card.query.filter_by(course_id=course.id).all()
-    return jsonify([card.to_dict() for card in cards])
+    # ?type= để lọc theo loại câu hỏi
+    return jsonify(load_course_cards(course.id, request.args.get("type")))
+
+@courses_bp.route("/api/courses/<int:course_id>/import", methods=["POST"])
+@token_required
+def import_cards_to_course(current_user, course_id):
+    """
+    Nhập câu hỏi từ file CSV hoặc JSONL (multipart field "file", hoặc gửi thẳng trong body).
+    Định dạng lấy từ ?format=, đuôi file hoặc Content-Type. Dòng lỗi được báo lại, không dừng cả lần nhập.
+    """
+    course = Course.query.filter_by(id=course_id, owner_id=current_user.id).first_or_404()
+    # File import lớn hơn nhiều so với MAX_CONTENT_LENGTH chung
+    request.max_content_length = current_app.config["IMPORT_MAX_CONTENT_LENGTH"]
+
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, mimetype = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, mimetype = request.stream, None, request.mimetype
+
+    import_format = detect_format(filename, mimetype, request.args.get("format"))
+    if import_format is None:
+        return jsonify({"error": "Unsupported import format, use csv or jsonl"}), 400
+
+    rows = iter_csv_rows(stream) if import_format == "csv" else iter_jsonl_rows(stream)
+    result = import_cards(
+        course.id, rows,
+        current_app.config["IMPORT_BATCH_SIZE"],
+        current_app.config["IMPORT_MAX_ERRORS"],
+    )
+
+    if result["imported"]:
+        try:
+            course.touch()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error updating course {course_id} after import: {str(e)}")
+        answer_key_cache.invalidate(course_id)
+        search_index.reindex_course(course_id)
+
+    status = 200 if result["imported"] or not result["failed"] else 400
+    return jsonify(dict(result, message="Import finished", format=import_format)), status
 
 @courses_bp.route("/api/courses/<int:course_id>/publish", methods=["POST"])
 @token_required
@@ -192,49 +334,35 @@ def publish_course_quiz(current_user, course_id):
     if not questions_data:
         return jsonify({"error": "Cannot publish a quiz with no questions"}), 400
 
-    try:
-        # Xóa các câu hỏi (cards) cũ của khóa học này để tránh trùng lặp
-        Card.query.filter_by(course_id=course.id).delete()
+    # mode=diff: chỉ ghi các câu hỏi thay đổi; mặc định ghi đè toàn bộ
+    mode = request.args.get("mode") or data.get("mode") or "replace"
+    if mode not in ("replace", "diff"):
+        return jsonify({"error": "Invalid publish mode"}), 400
 
-        # Thêm lại toàn bộ danh sách câu hỏi mới
-        for q_data in questions_data:
-            question_text = q_data.get("questionText")
-            back_content_data = {
-                "type": q_data.get("type"),
-                "options": q_data.get("options", []),
-                "correctAnswer": q_data.get("correctAnswer", "")
-            }
-            back_content_json = json.dumps(back_content_data)
-
-            new_card = Card(
-                front=question_text, 
-                back=back_content_json,
-                course_id=course.id
-            )
-            db.session.add(new_card)
+    try:
+        card_rows = build_card_rows(course.id, questions_data)
+        if mode == "diff":
+            changes = diff_cards(course.id, card_rows)
+        else:
+            changes = replace_cards(course.id, card_rows)
 
         # Đánh dấu khóa học là đã xuất bản
         course.is_published = True
-        
+        course.touch()
+        # Snapshot cho các route công khai, cùng transaction với lần publish
+        publish_snapshot(course)
+
         db.session.commit()
-        return jsonify({"message": "Quiz published successfully!"})
+        public_courses_cache.invalidate()
+        answer_key_cache.invalidate(course.id)
+        search_index.reindex_course(course.id)
+        return jsonify({"message": "Quiz published successfully!", "mode": mode, "changes": changes})
 
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error publishing quiz {course_id}: {str(e)}")
         return jsonify({"error": "An error occurred while publishing the quiz"}), 500
     
-@courses_bp.route("/api/courses/public", methods=["GET"])
-def get_public_courses():
-    try:
-        # Lấy tất cả các khóa học đã được xuất bản
-        # Sắp xếp theo ID mới nhất lên đầu
-        public_courses = Course.query.filter_by(is_published=True).order_by(Course.id.desc()).all()
-        
-        return jsonify([c.to_dict() for c in public_courses])
-    except Exception as e:
-        current_app.logger.error(f"Error getting public courses: {str(e)}")
-        return jsonify({"error": "Failed to load public courses"}), 500
 # Cho phép admin cập nhật course bất kỳ (không cần là owner)
 @courses_bp.route("/api/admin/courses/<int:course_id>", methods=["PUT"])
 @token_required
@@ -246,21 +374,28 @@ def admin_update_course(current_user, course_id):
     try:
         name = request.form.get("name")
         description = request.form.get("description")
-        image = request.files.get("image")
+        image_url = _course_image(current_user)
 
         if name:
             course.name = name
         if description is not None:
             course.description = description
 
-        if image:
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            filename = secure_filename(image.filename)
-            image.save(os.path.join(upload_folder, filename))
-            course.image = f"uploads/{filename}"
+        if image_url:
+            old_image = course.image
+            course.image = image_url
+            release(old_image)
 
+        course.touch()
         db.session.commit()
+        if course.is_published:
+            public_courses_cache.invalidate()
+        search_index.reindex_course(course.id)
         return jsonify({"message": "Course updated successfully", "course": course.to_dict()})
+    except UploadError as e:
+        return _upload_error(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Admin update course error: {str(e)}")
@@ -1,15 +1,14 @@
-from flask import Blueprint, request, jsonify
-from flask_login import current_user
+from flask import Blueprint, request, jsonify, current_app
 from app.models import db, Course, Favorite
+from app.auth import token_required
+from app.utils.streaming import stream_json_array, parse_since_arg, parse_page_args
 
 favorites_bp = Blueprint("favorites", __name__)
 
 # Thêm course vào danh sách yêu thích
 @favorites_bp.route("/favorites", methods=["POST"])
-def add_favorite():
-    if not current_user.is_authenticated:
-        return jsonify({"error": "Authentication required"}), 401
-
+@token_required
+def add_favorite(current_user):
     data = request.json or {}
     course_id = data.get("course_id")
 
@@ -17,7 +16,7 @@ def add_favorite():
         return jsonify({"error": "Missing course_id"}), 400
 
     course = Course.query.get(course_id)
-    if not course or (not course.public and course.owner_id != current_user.id):
+    if not course or (not course.public and not course.is_published and course.owner_id != current_user.id):
         return jsonify({"error": "Course not found or not accessible"}), 404
 
     existing = Favorite.query.filter_by(user_id=current_user.id, course_id=course_id).first()
@@ -36,10 +35,8 @@ def add_favorite():
 
 # Bỏ course khỏi danh sách yêu thích
 @favorites_bp.route("/favorites/<int:course_id>", methods=["DELETE"])
-def remove_favorite(course_id):
-    if not current_user.is_authenticated:
-        return jsonify({"error": "Authentication required"}), 401
-
+@token_required
+def remove_favorite(current_user, course_id):
     fav = Favorite.query.filter_by(user_id=current_user.id, course_id=course_id).first()
     if not fav:
         return jsonify({"error": "Favorite not found"}), 404
@@ -53,23 +50,29 @@ def remove_favorite(course_id):
 
     return jsonify({"message": "Removed from favorites"})
 
-# Lấy danh sách course đã yêu thích
+# Lấy danh sách course đã yêu thích (một truy vấn JOIN, có phân trang và lọc ?since=)
 @favorites_bp.route("/favorites", methods=["GET"])
-def get_favorites():
-    if not current_user.is_authenticated:
-        return jsonify({"error": "Authentication required"}), 401
-
-    favorites = Favorite.query.filter_by(user_id=current_user.id).all()
-    course_list = []
-
-    for f in favorites:
-        course = Course.query.get(f.course_id)
-        if course:
-            course_list.append({
-                "id": course.id,
-                "name": course.name,
-                "public": course.public,
-                "owner_id": course.owner_id
-            })
-
-    return jsonify(course_list)
+@token_required
+def get_favorites(current_user):
+    since, error = parse_since_arg(request)
+    if error:
+        return jsonify({"error": error}), 400
+    page, per_page = parse_page_args(
+        request, current_app.config["USER_LIST_PAGE_SIZE"], current_app.config["USER_LIST_MAX_PAGE_SIZE"]
+    )
+
+    query = (
+        db.session.query(Course.id, Course.name, Course.public, Course.owner_id)
+        .join(Favorite, Favorite.course_id == Course.id)
+        .filter(Favorite.user_id == current_user.id)
+    )
+    if since is not None:
+        query = query.filter(Favorite.created_at >= since)
+    query = query.order_by(Favorite.id.desc()).offset((page - 1) * per_page).limit(per_page)
+
+    return stream_json_array(query.yield_per(100), lambda row: {
+        "id": row.id,
+        "name": row.name,
+        "public": row.public,
+        "owner_id": row.owner_id
+    })
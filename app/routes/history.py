@@ -1,52 +1,61 @@
-from flask import Blueprint, request, jsonify
-from flask_login import current_user
+from flask import Blueprint, request, jsonify, current_app
 from app.models import db, Course, StudyHistory
-from datetime import datetime
+from app.auth import token_required
+from app.utils.streaming import stream_json_array, parse_since_arg, parse_page_args
+from app.utils.history_buffer import history_buffer, HistoryBufferFull
 
 history_bp = Blueprint("history", __name__)
 
-# Ghi lại lịch sử học
+# Ghi lại lịch sử học: đưa vào bộ đệm và trả về ngay, việc ghi DB diễn ra theo lô ở thread nền
 @history_bp.route("/history", methods=["POST"])
-def record_history():
-    if not current_user.is_authenticated:
-        return jsonify({"error": "Authentication required"}), 401
-
+@token_required
+def record_history(current_user):
     data = request.json or {}
     course_id = data.get("course_id")
 
     if not course_id:
         return jsonify({"error": "Missing course_id"}), 400
+    if isinstance(course_id, bool) or not isinstance(course_id, int):
+        return jsonify({"error": "course_id must be an integer"}), 400
 
-    course = Course.query.get(course_id)
-    if not course:
-        return jsonify({"error": "Course not found"}), 404
-
-    history = StudyHistory(user_id=current_user.id, course_id=course.id, studied_at=datetime.utcnow())
-    db.session.add(history)
+    # Course không tồn tại được lọc bỏ lúc ghi lô
     try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": "Database error", "details": str(e)}), 500
-
-    return jsonify({"message": "Study history recorded"})
-
-# Lấy danh sách lịch sử học
+        recorded = history_buffer.append(current_user.id, course_id)
+    except HistoryBufferFull:
+        response = jsonify({"error": "Study history is busy, please retry later"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    return jsonify({"message": "Study history recorded", "deduplicated": not recorded}), 202
+
+# Lấy danh sách lịch sử học (một truy vấn JOIN, có phân trang và lọc ?since=)
 @history_bp.route("/history", methods=["GET"])
-def get_history():
-    if not current_user.is_authenticated:
-        return jsonify({"error": "Authentication required"}), 401
-
-    history = StudyHistory.query.filter_by(user_id=current_user.id).order_by(StudyHistory.studied_at.desc()).all()
-
-    result = []
-    for h in history:
-        course = Course.query.get(h.course_id)
-        if course:
-            result.append({
-                "course_id": course.id,
-                "course_name": course.name,
-                "studied_at": h.studied_at.isoformat()
-            })
-
-    return jsonify(result)
+@token_required
+def get_history(current_user):
+    since, error = parse_since_arg(request)
+    if error:
+        return jsonify({"error": error}), 400
+    # Đọc được ngay các lượt học vừa gửi còn nằm trong bộ đệm
+    if history_buffer.has_pending(current_user.id):
+        history_buffer.flush()
+    page, per_page = parse_page_args(
+        request, current_app.config["USER_LIST_PAGE_SIZE"], current_app.config["USER_LIST_MAX_PAGE_SIZE"]
+    )
+
+    query = (
+        db.session.query(StudyHistory.studied_at, Course.id, Course.name)
+        .join(Course, Course.id == StudyHistory.course_id)
+        .filter(StudyHistory.user_id == current_user.id)
+    )
+    if since is not None:
+        query = query.filter(StudyHistory.studied_at >= since)
+    query = (
+        query.order_by(StudyHistory.studied_at.desc(), StudyHistory.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+    )
+
+    return stream_json_array(query.yield_per(100), lambda row: {
+        "course_id": row.id,
+        "course_name": row.name,
+        "studied_at": row.studied_at.isoformat() if row.studied_at else None
+    })
@@ -1,40 +1,158 @@
 # File: app/routes/public.py
 
-from flask import Blueprint, jsonify, current_app
-from app.models import Course, Card
+from flask import Blueprint, jsonify, current_app, request, abort
+from app.models import db, Course
+from app.auth import token_optional
+from app.utils.public_cache import public_courses_cache
+from app.utils.grading import answer_key_cache, upsert_progress
+from app.utils.http_cache import course_etag, published_only
+from app.utils.db_engine import read_replica
+from app.utils.quiz_snapshots import load_snapshot, accepts_gzip, snapshot_response
 
 public_bp = Blueprint("public", __name__)
 
 @public_bp.route("/api/courses/public", methods=["GET"])
+@read_replica
 def get_public_courses():
+    """
+    Danh sách quiz đã xuất bản, phân trang kiểu keyset: ?after_id=<id cuối trang trước>&limit=<n>.
+    Id để lấy trang kế tiếp được trả về trong header X-Next-After-Id (không có nếu đã hết).
+    """
     try:
-        public_courses = Course.query.filter_by(is_published=True).order_by(Course.id.desc()).all()
-        return jsonify([c.to_dict() for c in public_courses])
+        after_id = request.args.get("after_id", type=int)
+        limit = request.args.get("limit", default=current_app.config["PUBLIC_COURSES_PAGE_SIZE"], type=int)
+        limit = max(1, min(limit, current_app.config["PUBLIC_COURSES_MAX_PAGE_SIZE"]))
+
+        # Trang đầu được phục vụ từ cache
+        if after_id is None:
+            cached = public_courses_cache.get(limit)
+            if cached is not None:
+                return _public_page_response(*cached)
+
+        generation = public_courses_cache.generation
+        query = Course.query.filter_by(is_published=True)
+        if after_id is not None:
+            query = query.filter(Course.id < after_id)
+        # Lấy dư 1 dòng để biết còn trang sau hay không
+        courses = query.order_by(Course.id.desc()).limit(limit + 1).all()
+        next_after_id = courses[limit - 1].id if len(courses) > limit else None
+
+        body = current_app.json.dumps([c.to_dict() for c in courses[:limit]])
+        if after_id is None:
+            public_courses_cache.set(limit, (body, next_after_id), generation)
+        return _public_page_response(body, next_after_id)
     except Exception as e:
         current_app.logger.error(f"Error getting public courses: {str(e)}")
         return jsonify({"error": "Failed to load public courses"}), 500
 
+def _public_page_response(body, next_after_id):
+    response = current_app.response_class(body, mimetype="application/json")
+    if next_after_id is not None:
+        response.headers["X-Next-After-Id"] = str(next_after_id)
+    return response
+
 # --- THÊM 2 ROUTE MỚI Ở DƯỚI ---
 
 @public_bp.route("/api/public/quiz/<int:course_id>", methods=["GET"])
+@read_replica
+@course_etag("quiz", published_only, private=False)
 def get_public_quiz_details(course_id):
     """
     Lấy thông tin chi tiết của một quiz đã xuất bản. Bất kỳ ai cũng có thể truy cập.
+    Trả thẳng bytes của snapshot tạo lúc publish.
     """
-    try:
-        # Chỉ cần kiểm tra quiz có tồn tại và đã xuất bản chưa
-        course = Course.query.filter_by(id=course_id, is_published=True).first_or_404()
-        return jsonify(course.to_dict())
-    except Exception as e:
+    gzipped = accepts_gzip()
+    body = load_snapshot(course_id, "details", gzipped)
+    if body is None:
         return jsonify({"error": "Quiz not found or not published"}), 404
+    return snapshot_response(body, gzipped)
 
 @public_bp.route("/api/public/quiz/<int:course_id>/questions", methods=["GET"])
+@read_replica
+@course_etag("questions", published_only, private=False)
 def get_public_quiz_questions(course_id):
     """
-    Lấy tất cả câu hỏi của một quiz đã xuất bản.
+    Lấy tất cả câu hỏi của một quiz đã xuất bản (bytes của snapshot, gzip nếu client nhận).
+    """
+    gzipped = accepts_gzip()
+    body = load_snapshot(course_id, "questions", gzipped)
+    if body is None:
+        abort(404)
+    return snapshot_response(body, gzipped)
+
+@public_bp.route("/api/public/quiz/<int:course_id>/submit", methods=["POST"])
+@token_optional
+def submit_public_quiz(current_user, course_id):
+    """
+    Chấm bài trên server. Body một bài: {"answers": {card_id: đáp án}}.
+    Chế độ lô (nhập điểm cả lớp): {"submissions": [{"user_id": ..., "answers": {...}}, ...]};
+    user_id phải là chính người gọi, trừ admin (403 nếu không).
+    Progress chỉ được ghi khi có đăng nhập.
     """
-    # Kiểm tra xem quiz cha có tồn tại và đã xuất bản không để bảo mật
     course = Course.query.filter_by(id=course_id, is_published=True).first_or_404()
-    
-    cards = Card.query.filter_by(course_id=course.id).all()
-    return jsonify([card.to_dict() for card in cards])
\ No newline at end of file
+    data = request.get_json(silent=True) or {}
+    answer_key = answer_key_cache.get(course.id, course.version)
+
+    if "submissions" in data:
+        submissions = data.get("submissions")
+        if not isinstance(submissions, list):
+            return jsonify({"error": "'submissions' must be a list"}), 400
+        if len(submissions) > current_app.config["QUIZ_SUBMIT_MAX_BATCH"]:
+            return jsonify({"error": "Too many submissions in one request"}), 413
+
+        is_admin = current_user is not None and current_user.role == "ADMIN"
+        for submission in submissions:
+            user_id = submission.get("user_id") if isinstance(submission, dict) else None
+            if user_id is None:
+                continue
+            if isinstance(user_id, bool) or not isinstance(user_id, int):
+                return jsonify({"error": "'user_id' must be an integer"}), 400
+            if not is_admin and (current_user is None or user_id != current_user.id):
+                return jsonify({"error": "Cannot record progress for another user"}), 403
+
+        results = []
+        totals = {}
+        for index, submission in enumerate(submissions):
+            answers = submission.get("answers") if isinstance(submission, dict) else None
+            if not isinstance(answers, dict):
+                results.append({"index": index, "error": "Missing answers"})
+                continue
+            summary = answer_key.grade(answers, detailed=False)
+            user_id = submission.get("user_id")
+            summary["index"] = index
+            summary["user_id"] = user_id
+            results.append(summary)
+            if user_id is not None:
+                studied, correct = totals.get(user_id, (0, 0))
+                totals[user_id] = (studied + summary["answered"], correct + summary["correct"])
+
+        progress_rows = [
+            {"user_id": user_id, "course_id": course.id, "studied": studied, "correct": correct}
+            for user_id, (studied, correct) in totals.items()
+        ]
+    else:
+        answers = data.get("answers")
+        if not isinstance(answers, dict):
+            return jsonify({"error": "'answers' must be an object of card_id -> answer"}), 400
+        summary = answer_key.grade(answers)
+        results = summary
+        progress_rows = []
+        if current_user is not None:
+            progress_rows.append({
+                "user_id": current_user.id,
+                "course_id": course.id,
+                "studied": summary["answered"],
+                "correct": summary["correct"],
+            })
+
+    try:
+        upsert_progress(progress_rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error recording progress for quiz {course_id}: {str(e)}")
+        return jsonify({"error": "Failed to record progress"}), 500
+
+    if "submissions" in data:
+        return jsonify({"course_id": course.id, "results": results, "recorded": len(progress_rows)})
+    return jsonify(dict(results, course_id=course.id, recorded=bool(progress_rows)))
@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.models import Course
+from app.utils.search import search_index
+from app.utils.streaming import parse_page_args
+
+search_bp = Blueprint("search", __name__)
+
+@search_bp.route("/api/search", methods=["GET"])
+def search_courses():
+    """
+    Tìm quiz đã xuất bản theo tên, mô tả và nội dung câu hỏi (?q=, ?page=, ?per_page=).
+    Mỗi từ trong q được so khớp theo tiền tố; kết quả xếp theo độ liên quan.
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "Missing search query 'q'"}), 400
+    page, per_page = parse_page_args(
+        request, current_app.config["SEARCH_PAGE_SIZE"], current_app.config["SEARCH_MAX_PAGE_SIZE"]
+    )
+
+    try:
+        hits = search_index.search(query, per_page, (page - 1) * per_page)
+    except Exception as e:
+        current_app.logger.error(f"Error searching courses for '{query}': {str(e)}")
+        return jsonify({"error": "Search failed"}), 500
+
+    courses = {c.id: c for c in Course.query.filter(Course.id.in_([cid for cid, _ in hits])).all()} if hits else {}
+    results = []
+    for course_id, score in hits:
+        course = courses.get(course_id)
+        if course is not None:
+            results.append(dict(course.to_dict(), score=round(score, 4)))
+    return jsonify({"query": query, "page": page, "per_page": per_page, "results": results})
@@ -0,0 +1,167 @@
+from datetime import datetime, timezone
+
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import select, insert, update, or_
+
+from app.models import db, Card, CardReview, Course
+from app.auth import token_required
+from app.utils.cards import CARD_COLUMNS, CARD_ORDER, serialize_card_row
+from app.utils.grading import upsert_progress
+from app.utils.srs import schedule_review, PASSING_GRADE, MAX_GRADE
+
+study_bp = Blueprint("study", __name__)
+
+_STATE_FIELDS = ("interval", "ease", "reps", "lapses")
+
+
+def _readable_course_filter(current_user):
+    # Admin học được mọi khóa; người khác chỉ khóa đã publish hoặc của chính mình
+    if current_user.role == "ADMIN":
+        return None
+    return or_(Course.is_published.is_(True), Course.owner_id == current_user.id)
+
+
+def _serialize_due(row):
+    card = serialize_card_row(row)
+    card["due_at"] = row.due_at.isoformat() if row.due_at else None
+    card["reps"] = row.reps
+    return card
+
+
+@study_bp.route("/api/study/due", methods=["GET"])
+@token_required
+def get_due_cards(current_user):
+    """
+    Các card đến hạn ôn của người dùng, sớm nhất trước (?limit=, ?course_id=).
+    Khi có course_id và còn chỗ trống, bổ sung card chưa học lần nào của khóa học đó.
+    """
+    limit = request.args.get("limit", current_app.config["STUDY_DUE_LIMIT"], type=int)
+    limit = max(1, min(limit, current_app.config["STUDY_DUE_MAX_LIMIT"]))
+    course_id = request.args.get("course_id", type=int)
+    now = datetime.utcnow()
+
+    if course_id is not None:
+        readable = _readable_course_filter(current_user)
+        course_query = select(Course.id).where(Course.id == course_id)
+        if readable is not None:
+            course_query = course_query.where(readable)
+        if db.session.execute(course_query).first() is None:
+            return jsonify({"error": "Course not found"}), 404
+
+    # Quét khoảng trên chỉ mục (user_id, due_at)
+    query = (
+        select(*CARD_COLUMNS, CardReview.due_at, CardReview.reps)
+        .join(Card, Card.id == CardReview.card_id)
+        .where(CardReview.user_id == current_user.id, CardReview.due_at <= now)
+    )
+    if course_id is not None:
+        query = query.where(CardReview.course_id == course_id)
+    rows = db.session.execute(query.order_by(CardReview.due_at).limit(limit)).all()
+    cards = [_serialize_due(row) for row in rows]
+
+    if course_id is not None and len(cards) < limit:
+        seen = select(CardReview.card_id).where(
+            CardReview.user_id == current_user.id, CardReview.course_id == course_id
+        )
+        new_rows = db.session.execute(
+            select(*CARD_COLUMNS)
+            .where(Card.course_id == course_id, Card.id.not_in(seen))
+            .order_by(*CARD_ORDER)
+            .limit(limit - len(cards))
+        ).all()
+        for row in new_rows:
+            card = serialize_card_row(row)
+            card["due_at"] = None
+            card["reps"] = 0
+            cards.append(card)
+
+    return jsonify(cards)
+
+
+@study_bp.route("/api/study/reviews", methods=["POST"])
+@token_required
+def submit_reviews(current_user):
+    """
+    Ghi nhiều kết quả ôn tập trong một transaction.
+    Body: {"reviews": [{"card_id": 1, "grade": 0-5, "reviewed_at": "ISO 8601 (tùy chọn)"}]}
+    """
+    data = request.get_json(silent=True) or {}
+    reviews = data.get("reviews")
+    if not isinstance(reviews, list) or not reviews:
+        return jsonify({"error": "'reviews' must be a non-empty list"}), 400
+    if len(reviews) > current_app.config["STUDY_REVIEWS_MAX_BATCH"]:
+        return jsonify({"error": "Too many reviews in one request"}), 413
+
+    now = datetime.utcnow()
+    parsed = []
+    for index, review in enumerate(reviews):
+        try:
+            card_id = int(review["card_id"])
+            grade = int(review["grade"])
+            reviewed_at = datetime.fromisoformat(review["reviewed_at"]) if review.get("reviewed_at") else now
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": f"Invalid review at index {index}"}), 400
+        if not 0 <= grade <= MAX_GRADE:
+            return jsonify({"error": f"Grade must be between 0 and {MAX_GRADE} (index {index})"}), 400
+        # Lưu theo UTC không kèm múi giờ như datetime.utcnow(); giờ không có múi giờ coi là UTC
+        if reviewed_at.tzinfo is not None:
+            reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+        parsed.append((card_id, grade, reviewed_at))
+
+    card_ids = {card_id for card_id, _, _ in parsed}
+    # Card thuộc khóa học người dùng không được xem cũng coi như không tồn tại
+    card_query = select(Card.id, Card.course_id).join(Course, Course.id == Card.course_id).where(Card.id.in_(card_ids))
+    readable = _readable_course_filter(current_user)
+    if readable is not None:
+        card_query = card_query.where(readable)
+    course_by_card = dict(db.session.execute(card_query).all())
+    missing = card_ids - course_by_card.keys()
+    if missing:
+        return jsonify({"error": "Cards not found", "card_ids": sorted(missing)}), 404
+
+    # Nạp trạng thái hiện có của các card trong lô bằng một truy vấn
+    existing = {
+        row.card_id: {field: getattr(row, field) for field in _STATE_FIELDS}
+        for row in db.session.execute(
+            select(CardReview.card_id, *[getattr(CardReview, f) for f in _STATE_FIELDS])
+            .where(CardReview.user_id == current_user.id, CardReview.card_id.in_(card_ids))
+        )
+    }
+
+    states = {}
+    progress = {}
+    for card_id, grade, reviewed_at in sorted(parsed, key=lambda item: item[2]):
+        previous = states.get(card_id) or existing.get(card_id) or {}
+        states[card_id] = schedule_review(previous, grade, reviewed_at)
+        course_id = course_by_card[card_id]
+        studied, correct = progress.get(course_id, (0, 0))
+        progress[course_id] = (studied + 1, correct + (grade >= PASSING_GRADE))
+
+    rows = [
+        dict(state, user_id=current_user.id, card_id=card_id, course_id=course_by_card[card_id])
+        for card_id, state in states.items()
+    ]
+    try:
+        updates = [row for row in rows if row["card_id"] in existing]
+        inserts = [row for row in rows if row["card_id"] not in existing]
+        if updates:
+            db.session.execute(update(CardReview), updates)
+        if inserts:
+            db.session.execute(insert(CardReview), inserts)
+        upsert_progress([
+            {"user_id": current_user.id, "course_id": course_id, "studied": studied, "correct": correct}
+            for course_id, (studied, correct) in progress.items()
+        ])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error saving reviews for user {current_user.id}: {str(e)}")
+        return jsonify({"error": "Database error while saving reviews"}), 500
+
+    return jsonify({
+        "message": "Reviews recorded",
+        "cards": [
+            {"card_id": row["card_id"], "due_at": row["due_at"].isoformat(), "interval": row["interval"]}
+            for row in rows
+        ]
+    })
@@ -0,0 +1,123 @@
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app.models import db, UploadSession
+from app.auth import token_required
+from app.utils.uploads import UploadError
+from app.utils.chunked_uploads import (
+    open_session, write_chunk, finalize, discard, received_bytes, is_expired,
+)
+
+uploads_bp = Blueprint("uploads", __name__)
+
+
+@uploads_bp.errorhandler(UploadError)
+def handle_upload_error(e):
+    return jsonify(dict(e.details, error=str(e))), e.status
+
+
+@uploads_bp.errorhandler(RequestEntityTooLarge)
+def handle_too_large(e):
+    return jsonify({"error": "Chunk is too large", "max_chunk_size": current_app.config["UPLOAD_MAX_CHUNK_SIZE"]}), 413
+
+
+def _get_session(current_user, upload_id):
+    session = UploadSession.query.filter_by(id=upload_id, user_id=current_user.id).first()
+    if session is None:
+        raise UploadError("Upload not found", 404)
+    if is_expired(session):
+        raise UploadError("Upload has expired", 410)
+    return session
+
+
+def _session_state(session, offset=None):
+    return {
+        "id": session.id,
+        "offset": received_bytes(session) if offset is None else offset,
+        "size": session.size,
+        "finalized": bool(session.content_hash),
+    }
+
+
+@uploads_bp.route("/api/uploads", methods=["POST"])
+@token_required
+def init_upload(current_user):
+    """
+    Mở một upload chia chunk: body {"filename": ..., "size": <tổng số byte>}.
+    Đuôi file, kích thước và quota được kiểm tra ngay, trước khi gửi byte nào.
+    """
+    data = request.get_json(silent=True) or {}
+    size = data.get("size")
+    if not isinstance(size, int) or isinstance(size, bool):
+        return jsonify({"error": "'size' must be an integer"}), 400
+
+    session = open_session(current_user.id, data.get("filename") or "", size)
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error creating upload session for user {current_user.id}: {str(e)}")
+        return jsonify({"error": "Failed to start upload"}), 500
+    return jsonify(dict(_session_state(session, 0), chunk_size=current_app.config["UPLOAD_MAX_CHUNK_SIZE"])), 201
+
+
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["GET"])
+@token_required
+def get_upload(current_user, upload_id):
+    """
+    Trạng thái upload; offset là vị trí để gửi tiếp khi resume.
+    """
+    return jsonify(_session_state(_get_session(current_user, upload_id)))
+
+
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["PUT"])
+@token_required
+def put_upload_chunk(current_user, upload_id):
+    """
+    Gửi một chunk (body thô) tại ?offset=<số byte đã nhận>. Cần Content-Length;
+    chunk vượt quá size đã khai báo bị từ chối trước khi đọc body.
+    """
+    session = _get_session(current_user, upload_id)
+    offset = request.args.get("offset", type=int)
+    if offset is None:
+        return jsonify({"error": "'offset' is required"}), 400
+    if request.content_length is None:
+        return jsonify({"error": "Content-Length is required"}), 411
+
+    try:
+        new_offset = write_chunk(session, offset, request.stream, request.content_length)
+    except UploadError as e:
+        # Nội dung không phải ảnh như khai báo: hủy luôn phiên
+        if e.status == 415:
+            discard(session)
+            db.session.commit()
+        raise
+    return jsonify(_session_state(session, new_offset))
+
+
+@uploads_bp.route("/api/uploads/<upload_id>/finalize", methods=["POST"])
+@token_required
+def finalize_upload(current_user, upload_id):
+    """
+    Kết thúc upload khi đã nhận đủ byte. Sau đó gửi upload_id khi tạo / sửa khóa học.
+    """
+    session = _get_session(current_user, upload_id)
+    content_hash = finalize(session)
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error finalizing upload {upload_id}: {str(e)}")
+        return jsonify({"error": "Failed to finalize upload"}), 500
+    return jsonify(dict(_session_state(session, session.size), sha256=content_hash))
+
+
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["DELETE"])
+@token_required
+def cancel_upload(current_user, upload_id):
+    session = UploadSession.query.filter_by(id=upload_id, user_id=current_user.id).first()
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    discard(session)
+    db.session.commit()
+    return jsonify({"message": "Upload cancelled"})
@@ -0,0 +1,179 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from sqlalchemy import insert, delete, select, update, func
+
+from app.models import db, Card, CardReview
+
+# Một encoder dùng chung cho cả lô, tránh dựng lại cấu hình mỗi lần gọi json.dumps
+_encoder = json.JSONEncoder(ensure_ascii=True)
+
+
+def card_content_hash(front, back):
+    """
+    Hash ổn định của nội dung card, dùng để so khớp khi publish kiểu diff.
+    """
+    digest = hashlib.sha1()
+    digest.update((front or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((back or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Các cột lấy ra khi phục vụ câu hỏi, không dựng ORM object
+CARD_COLUMNS = (
+    Card.id, Card.front, Card.back, Card.course_id,
+    Card.question_type, Card.options, Card.correct_answer,
+)
+
+# Thứ tự câu hỏi trong một khóa học
+CARD_ORDER = (Card.position, Card.id)
+
+
+def next_card_position(course_id):
+    """
+    Vị trí cho card thêm vào cuối khóa học.
+    """
+    return db.session.execute(
+        select(func.coalesce(func.max(Card.position) + 1, 0)).where(Card.course_id == course_id)
+    ).scalar()
+
+
+def build_card_rows(course_id, questions_data, start=0):
+    """
+    Chuyển danh sách câu hỏi từ frontend thành các dict sẵn sàng để bulk insert.
+    position theo thứ tự trong danh sách, bắt đầu từ start.
+    """
+    encode = _encoder.encode
+    rows = []
+    for position, q_data in enumerate(questions_data, start):
+        front = q_data.get("questionText")
+        question_type = q_data.get("type")
+        options = q_data.get("options", [])
+        correct_answer = q_data.get("correctAnswer", "")
+        back = encode({
+            "type": question_type,
+            "options": options,
+            "correctAnswer": correct_answer
+        })
+        rows.append({
+            "front": front,
+            "back": back,
+            "course_id": course_id,
+            "content_hash": card_content_hash(front, back),
+            "question_type": question_type,
+            "options": options,
+            "correct_answer": correct_answer,
+            "position": position,
+        })
+    return rows
+
+
+def typed_fields_from_back(back):
+    """
+    Tách chuỗi JSON 'back' kiểu cũ thành các cột có cấu trúc.
+    """
+    try:
+        data = json.loads(back) if back else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    return {
+        "question_type": data.get("type"),
+        "options": data.get("options", []),
+        "correct_answer": data.get("correctAnswer", ""),
+    }
+
+
+def serialize_card_row(row):
+    return {
+        "id": row.id,
+        "front": row.front,
+        "back": row.back,
+        "course_id": row.course_id,
+        "type": row.question_type,
+        "options": row.options or [],
+        "correctAnswer": row.correct_answer or "",
+    }
+
+
+def load_course_cards(course_id, question_type=None):
+    """
+    Trả về các card của một khóa học dưới dạng dict đã giải mã sẵn, đọc thẳng từ cột.
+    """
+    query = select(*CARD_COLUMNS).where(Card.course_id == course_id)
+    if question_type:
+        query = query.where(Card.question_type == question_type)
+    return [serialize_card_row(row) for row in db.session.execute(query.order_by(*CARD_ORDER))]
+
+
+def delete_card_reviews(*criteria):
+    """
+    Xóa lịch ôn của các card sắp bị xóa. ON DELETE CASCADE của card_reviews không chạy trên
+    SQLite (foreign_keys mặc định tắt) nên mọi chỗ xóa card / khóa học gọi tường minh. Không commit.
+    """
+    db.session.execute(delete(CardReview).where(*criteria))
+
+
+def replace_cards(course_id, rows):
+    """
+    Xóa toàn bộ card cũ rồi chèn lại bằng một lệnh executemany. Không commit.
+    """
+    delete_card_reviews(CardReview.course_id == course_id)
+    deleted = db.session.execute(delete(Card).where(Card.course_id == course_id)).rowcount
+    if rows:
+        db.session.execute(insert(Card), rows)
+    return {"inserted": len(rows), "updated": 0, "deleted": deleted, "unchanged": 0}
+
+
+def diff_cards(course_id, rows):
+    """
+    Chỉ ghi những card thực sự thay đổi, so khớp theo content_hash: card trùng hash được
+    giữ nguyên (cùng id, nên CardReview / tiến độ vẫn gắn đúng câu hỏi) và chỉ UPDATE position
+    khi thứ tự đổi, nội dung mới được INSERT, card cũ không khớp bị DELETE.
+    Không bao giờ tái sử dụng id cho nội dung khác. Không commit.
+    """
+    existing = db.session.execute(
+        select(Card.id, Card.front, Card.back, Card.content_hash, Card.position)
+        .where(Card.course_id == course_id)
+        .order_by(*CARD_ORDER)
+    ).all()
+
+    # Card cũ gom theo hash (card tạo trước khi có cột content_hash thì tính lại)
+    existing_by_hash = defaultdict(list)
+    for card in existing:
+        content_hash = card.content_hash or card_content_hash(card.front, card.back)
+        existing_by_hash[content_hash].append(card)
+
+    unchanged = 0
+    inserts = []
+    moves = []
+    for row in rows:
+        matches = existing_by_hash.get(row["content_hash"])
+        if matches:
+            card = matches.pop(0)
+            if card.position == row["position"]:
+                unchanged += 1
+            else:
+                moves.append({"id": card.id, "position": row["position"]})
+        else:
+            inserts.append(row)
+
+    delete_ids = sorted(card.id for cards in existing_by_hash.values() for card in cards)
+
+    if inserts:
+        db.session.execute(insert(Card), inserts)
+    if moves:
+        db.session.execute(update(Card), moves)
+    if delete_ids:
+        delete_card_reviews(CardReview.card_id.in_(delete_ids))
+        db.session.execute(delete(Card).where(Card.id.in_(delete_ids)))
+
+    return {
+        "inserted": len(inserts),
+        "updated": len(moves),
+        "deleted": len(delete_ids),
+        "unchanged": unchanged,
+    }
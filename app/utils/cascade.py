@@ -0,0 +1,25 @@
+from sqlalchemy import delete
+
+from app.models import db, Favorite, StudyHistory, StudyRollup
+
+
+def delete_course_rows(course_ids):
+    """
+    Xóa các dòng tham chiếu tới những khóa học sắp bị xóa (yêu thích, lịch sử học và rollup theo
+    ngày của mọi user).
+    Gọi trước db.session.delete(course): ORM sẽ cố gán NULL cho các cột NOT NULL này. Không commit.
+    """
+    course_ids = list(course_ids)
+    if not course_ids:
+        return
+    for model in (Favorite, StudyHistory, StudyRollup):
+        db.session.execute(delete(model).where(model.course_id.in_(course_ids)))
+
+
+def delete_user_rows(user_id):
+    """
+    Xóa các dòng của user sắp bị xóa (yêu thích, lịch sử học, rollup ở khóa học của người khác). Khóa học của chính
+    user đi qua delete_course_rows. Không commit.
+    """
+    for model in (Favorite, StudyHistory, StudyRollup):
+        db.session.execute(delete(model).where(model.user_id == user_id))
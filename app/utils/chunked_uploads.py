@@ -0,0 +1,210 @@
+import fcntl
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+
+from app.models import db, UploadSession
+from app.utils.uploads import UploadError, allowed_extension, check_magic, store_file, MAGIC_BYTES_LENGTH
+
+# Thư mục con của UPLOAD_FOLDER (cùng ổ đĩa) nên file ghép xong chỉ cần đổi tên để vào kho
+PARTIAL_DIR = ".partial"
+
+
+def partial_path(session_id):
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], PARTIAL_DIR, session_id)
+
+
+def received_bytes(session):
+    """
+    Số byte đã nhận, đọc thẳng từ file tạm (đúng cả khi chunk trước bị ngắt giữa chừng).
+    """
+    try:
+        return os.path.getsize(partial_path(session.id))
+    except FileNotFoundError:
+        return 0
+
+
+def _expires_before():
+    return datetime.utcnow() - timedelta(seconds=current_app.config["UPLOAD_SESSION_TTL"])
+
+
+def is_expired(session):
+    return session.created_at < _expires_before()
+
+
+def open_session(user_id, filename, size):
+    """
+    Tạo phiên upload sau khi kiểm tra đuôi file, kích thước và quota (tổng size khai báo của
+    các phiên chưa hết hạn của user). Không commit.
+    """
+    ext = allowed_extension(filename)
+    max_size = current_app.config["UPLOAD_MAX_SIZE"]
+    if size <= 0:
+        raise UploadError("'size' must be a positive integer", 400)
+    if size > max_size:
+        raise UploadError("File is too large", 413, max_size=max_size)
+
+    quota = current_app.config["UPLOAD_USER_QUOTA"]
+    used = db.session.query(func.coalesce(func.sum(UploadSession.size), 0)).filter(
+        UploadSession.user_id == user_id,
+        UploadSession.created_at >= _expires_before(),
+    ).scalar()
+    if used + size > quota:
+        raise UploadError("Upload quota exceeded", 413, quota=quota, used=int(used))
+
+    session = UploadSession(id=uuid.uuid4().hex, user_id=user_id, extension=ext, size=size,
+                            created_at=datetime.utcnow())
+    db.session.add(session)
+    os.makedirs(os.path.dirname(partial_path(session.id)), exist_ok=True)
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Ghi length byte từ stream vào file tạm tại offset (phải bằng số byte đã nhận).
+    File tạm được khóa (flock) trong suốt lần ghi: hai PUT song song cho cùng phiên không thể
+    cùng qua bước kiểm tra offset rồi ghi chồng lên nhau; PUT đến sau nhận 409.
+    Chữ ký file được so ngay khi có đủ min(MAGIC_BYTES_LENGTH, size) byte đầu, dù chúng đến qua
+    nhiều lần đọc hay nhiều chunk, trước khi ghi phần còn lại. Đọc bằng readinto vào một buffer
+    dùng lại, ghi thẳng vào file đích nên không có bản sao hay bước ghép nào. Trả về offset mới.
+    """
+    if session.content_hash:
+        raise UploadError("Upload is already finalized", 409)
+    if length > current_app.config["UPLOAD_MAX_CHUNK_SIZE"]:
+        raise UploadError("Chunk is too large", 413, max_chunk_size=current_app.config["UPLOAD_MAX_CHUNK_SIZE"])
+
+    path = partial_path(session.id)
+    # Mở không cắt cụt file: kích thước (số byte đã nhận) chỉ được đọc sau khi giữ khóa
+    with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o666), "r+b") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("Another chunk is being written to this upload", 409)
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadError("Offset does not match the bytes received so far", 409, offset=current)
+        if offset + length > session.size:
+            raise UploadError("Chunk exceeds the declared upload size", 413, offset=current, size=session.size)
+
+        buffer = memoryview(bytearray(min(current_app.config["UPLOAD_CHUNK_SIZE"], max(length, 1))))
+        magic_length = min(MAGIC_BYTES_LENGTH, session.size)
+        written = 0
+        # Phần đầu file đã nhận từ các chunk trước (None khi chữ ký đã được kiểm tra)
+        head = (f.read(offset) if offset else b"") if offset < magic_length else None
+        f.seek(offset)
+        while written < length:
+            n = stream.readinto(buffer[:min(len(buffer), length - written)])
+            if not n:
+                break
+            if head is not None:
+                head += bytes(buffer[:min(n, magic_length - len(head))])
+                if len(head) >= magic_length:
+                    check_magic(session.extension, head)
+                    head = None
+            f.write(buffer[:n])
+            written += n
+    return offset + written
+
+
+def finalize(session):
+    """
+    Kiểm tra đã nhận đủ byte và tính sha256 của file; sau bước này phiên có thể gắn vào khóa học. Không commit.
+    """
+    if session.content_hash:
+        return session.content_hash
+    current = received_bytes(session)
+    if current != session.size:
+        raise UploadError("Upload is incomplete", 409, offset=current, size=session.size)
+    digest = hashlib.sha256()
+    with open(partial_path(session.id), "rb") as f:
+        while True:
+            chunk = f.read(current_app.config["UPLOAD_CHUNK_SIZE"])
+            if not chunk:
+                break
+            digest.update(chunk)
+    session.content_hash = digest.hexdigest()
+    return session.content_hash
+
+
+def discard(session):
+    """
+    Hủy phiên và xóa file tạm. Không commit.
+    """
+    try:
+        os.remove(partial_path(session.id))
+    except FileNotFoundError:
+        pass
+    db.session.delete(session)
+
+
+def attach_upload(session_id, user_id):
+    """
+    Đưa file của một phiên đã finalize vào kho ảnh (hard link, không sao chép) và xóa phiên.
+    File tạm chỉ bị xóa sau khi commit thành công, nên commit lỗi thì vẫn gắn lại được.
+    Dùng cho upload_id khi tạo / sửa khóa học. Không commit. Trả về "uploads/<tên>".
+    """
+    session = UploadSession.query.filter_by(id=session_id, user_id=user_id).first()
+    if session is None or is_expired(session):
+        raise UploadError("Upload not found", 404)
+    if not session.content_hash:
+        raise UploadError("Upload is not finalized", 409)
+    image_url = store_file(partial_path(session.id), session.content_hash + session.extension, session.size,
+                           keep_source=True)
+    db.session.delete(session)
+    db.session.info.setdefault("partials_to_unlink", set()).add(session.id)
+    return image_url
+
+
+def _unlink_partials_after_commit(db_session):
+    for session_id in db_session.info.pop("partials_to_unlink", ()):
+        try:
+            os.remove(partial_path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_expired():
+    """
+    Xóa các phiên quá UPLOAD_SESSION_TTL và file tạm không còn phiên nào. Trả về số file đã xóa.
+    """
+    expired = UploadSession.query.filter(UploadSession.created_at < _expires_before()).all()
+    for session in expired:
+        db.session.delete(session)
+    db.session.commit()
+
+    partial_dir = os.path.join(current_app.config["UPLOAD_FOLDER"], PARTIAL_DIR)
+    if not os.path.isdir(partial_dir):
+        return 0
+    live = {session_id for (session_id,) in db.session.query(UploadSession.id)}
+    removed = 0
+    for entry in os.scandir(partial_dir):
+        if entry.is_file() and entry.name not in live:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def init_app(app):
+    event.listen(db.session, "after_commit", _unlink_partials_after_commit)
+    event.listen(db.session, "after_soft_rollback",
+                 lambda db_session, previous: db_session.info.pop("partials_to_unlink", None))
+    app.cli.add_command(cleanup_uploads_command)
+
+
+@click.command("cleanup-uploads")
+@with_appcontext
+def cleanup_uploads_command():
+    """
+    Dọn các upload chia chunk bỏ dở (chạy định kỳ).
+    """
+    removed = cleanup_expired()
+    click.echo(f"Removed {removed} abandoned partial upload(s)")
@@ -0,0 +1,186 @@
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+REPLICA_BIND = "replica"
+
+
+class PoolWaitStats:
+    """
+    Thời gian chờ lấy connection từ pool (tổng, lớn nhất, số lần), gộp cho mọi engine.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def record(self, elapsed, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+            self.timeouts += timed_out
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+                "timeouts": self.timeouts,
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool đo thời gian mỗi lần checkout (gồm cả chờ khi pool đã hết connection).
+    """
+
+    # Log của pool đi theo logger "sqlalchemy.pool" như mặc định, không lẫn vào logger "app" của Flask
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.TimedQueuePool"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except Exception:
+            pool_wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_wait_stats.record(time.perf_counter() - started)
+        return connection
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(config, uri):
+    """
+    Dựng SQLALCHEMY_ENGINE_OPTIONS từ hồ sơ DB_* của môi trường, theo loại CSDL của uri.
+    """
+    if not uri:
+        return {}
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if _is_sqlite_memory(url):
+        # SQLite trong bộ nhớ dùng SingletonThreadPool, không có khái niệm pool size
+        return {}
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    if backend == "sqlite":
+        options["connect_args"] = {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}
+        return options
+
+    options["pool_recycle"] = config["DB_POOL_RECYCLE"]
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if timeout_ms:
+        if backend == "mysql":
+            options["connect_args"] = {"init_command": f"SET SESSION max_execution_time={int(timeout_ms)}"}
+        elif backend == "postgresql":
+            options["connect_args"] = {"options": f"-c statement_timeout={int(timeout_ms)}"}
+    return options
+
+
+def configure_engines(app):
+    """
+    Điền engine options và bind replica (nếu có DATABASE_REPLICA_URL) trước db.init_app.
+    Giá trị SQLALCHEMY_ENGINE_OPTIONS / SQLALCHEMY_BINDS đặt sẵn trong config được giữ nguyên.
+    """
+    config = app.config
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if "SQLALCHEMY_ENGINE_OPTIONS" not in config:
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(config, uri)
+    replica_uri = config.get("DATABASE_REPLICA_URL")
+    if replica_uri and REPLICA_BIND not in config.get("SQLALCHEMY_BINDS", {}):
+        binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+        binds[REPLICA_BIND] = dict(engine_options(config, replica_uri), url=replica_uri)
+        config["SQLALCHEMY_BINDS"] = binds
+
+
+def _sqlite_pragmas(wal, busy_timeout_ms):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def init_app(app, db):
+    """
+    Gắn PRAGMA cho các engine SQLite (WAL + synchronous=NORMAL với file DB). Gọi sau db.init_app.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != "sqlite":
+                continue
+            wal = app.config["SQLITE_WAL"] and not _is_sqlite_memory(engine.url)
+            event.listen(engine, "connect", _sqlite_pragmas(wal, app.config["SQLITE_BUSY_TIMEOUT_MS"]))
+
+
+class RoutingSession(Session):
+    """
+    Session đọc từ bind "replica" khi request đang chạy trong read_replica và không ghi gì.
+    Không cấu hình replica thì hoạt động như session mặc định.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get("use_replica"):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(f):
+    """
+    Decorator cho route chỉ đọc: mọi truy vấn trong route đi tới replica (nếu có).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        previous = g.get("use_replica", False)
+        g.use_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.use_replica = previous
+    return decorated_function
+
+
+def pool_stats(db):
+    """
+    Trạng thái pool của từng engine kèm thời gian chờ checkout.
+    """
+    engines = {}
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        status = {"class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        engines[key or "default"] = status
+    return {"engines": engines, "checkout_wait": pool_wait_stats.stats()}
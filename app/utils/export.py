@@ -0,0 +1,188 @@
+import csv
+import io
+import os
+import time
+import zipfile
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import select
+
+from app.models import db, Course, Card
+
+EXPORT_FORMATS = ("jsonl", "csv")
+
+_MIMETYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+# Cột CSV dùng cùng tên với file import để có thể nhập lại trực tiếp
+CSV_CARD_FIELDS = ("questionText", "type", "options", "correctAnswer")
+CSV_LIBRARY_FIELDS = ("course_id", "course_name", "course_description") + CSV_CARD_FIELDS
+
+
+def _card_fields(row):
+    return {
+        "questionText": row.front,
+        "type": row.question_type,
+        "options": row.options or [],
+        "correctAnswer": row.correct_answer or "",
+    }
+
+
+def _course_fields(row):
+    return {
+        "id": row.course_id,
+        "name": row.course_name,
+        "description": row.course_description,
+        "image": row.course_image,
+        "is_published": row.course_is_published,
+    }
+
+
+def iter_export_rows(course_filter, yield_per):
+    """
+    Đọc course + card bằng một truy vấn join, theo từng phần yield_per dòng
+    (server-side cursor), sắp theo course rồi card. Course chưa có card cho ra một dòng card rỗng.
+    """
+    query = (
+        select(
+            Course.id.label("course_id"), Course.name.label("course_name"),
+            Course.description.label("course_description"), Course.image.label("course_image"),
+            Course.is_published.label("course_is_published"),
+            Card.id.label("card_id"), Card.front, Card.question_type, Card.options, Card.correct_answer,
+        )
+        .outerjoin(Card, Card.course_id == Course.id)
+        .where(course_filter)
+        .order_by(Course.id, Card.position, Card.id)
+        .execution_options(yield_per=yield_per)
+    )
+    return db.session.execute(query)
+
+
+def _jsonl_course_lines(rows):
+    # Chỉ các dòng card: nhập lại được bằng /import
+    dumps = current_app.json.dumps
+    for row in rows:
+        if row.card_id is not None:
+            yield dumps(_card_fields(row)) + "\n"
+
+
+def _jsonl_library_lines(rows):
+    # Mỗi course một dòng {"course": {...}}, theo sau là các card của nó (có course_id)
+    dumps = current_app.json.dumps
+    last_course_id = None
+    for row in rows:
+        if row.course_id != last_course_id:
+            last_course_id = row.course_id
+            yield dumps({"course": _course_fields(row)}) + "\n"
+        if row.card_id is not None:
+            yield dumps(dict(_card_fields(row), course_id=row.course_id)) + "\n"
+
+
+def _csv_lines(rows, fields, with_course):
+    dumps = current_app.json.dumps
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        if row.card_id is None:
+            continue
+        record = _card_fields(row)
+        record["options"] = dumps(record["options"])
+        if with_course:
+            record.update(course_id=row.course_id, course_name=row.course_name,
+                          course_description=row.course_description)
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_lines(rows, export_format, library=False):
+    if export_format == "csv":
+        fields = CSV_LIBRARY_FIELDS if library else CSV_CARD_FIELDS
+        return _csv_lines(rows, fields, library)
+    return _jsonl_library_lines(rows) if library else _jsonl_course_lines(rows)
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Đích ghi (không seek được) cho ZipFile: gom các byte đã ghi để generator lấy ra và gửi dần.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.pending = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        self.pending += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+
+def _zip_member(name, compress_type):
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = compress_type
+    return info
+
+
+def zip_export(data_name, lines, image_names, chunk_size):
+    """
+    Ghi file dữ liệu rồi các ảnh (uploads/<tên>) vào zip và trả từng phần ngay khi đủ
+    chunk_size byte; không giữ cả file zip hay cả một ảnh trong bộ nhớ.
+    """
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        with archive.open(_zip_member(data_name, zipfile.ZIP_DEFLATED), "w", force_zip64=True) as member:
+            for line in lines:
+                member.write(line.encode("utf-8"))
+                if sink.pending >= chunk_size:
+                    yield sink.drain()
+
+        for name in image_names:
+            path = os.path.join(upload_folder, name)
+            if not os.path.isfile(path):
+                continue
+            # Ảnh đã nén sẵn: lưu nguyên, không nén lại
+            with open(path, "rb") as src, \
+                    archive.open(_zip_member(f"uploads/{name}", zipfile.ZIP_STORED), "w", force_zip64=True) as member:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    member.write(chunk)
+                    if sink.pending >= chunk_size:
+                        yield sink.drain()
+    yield sink.drain()
+
+
+def export_response(basename, export_format, lines, image_names=None):
+    """
+    Response stream cho export. image_names (iterable tên file trong UPLOAD_FOLDER) khác None
+    thì đóng gói dữ liệu cùng ảnh thành <basename>.zip.
+    """
+    if image_names is not None:
+        body = zip_export(f"{basename}.{export_format}", lines, image_names,
+                          current_app.config["UPLOAD_CHUNK_SIZE"])
+        filename, mimetype = f"{basename}.zip", "application/zip"
+    else:
+        body, filename, mimetype = lines, f"{basename}.{export_format}", _MIMETYPES[export_format]
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,148 @@
+import gzip
+import mimetypes
+import os
+from urllib.parse import quote
+
+import click
+from flask import abort, current_app, request, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+from app.utils.http_cache import is_immutable_upload
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn: thiếu thì chỉ tạo bản gzip
+    brotli = None
+
+SENDFILE_MODES = ("x-accel-redirect", "x-sendfile")
+
+# Content-Encoding -> đuôi file nén sẵn, theo thứ tự ưu tiên
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# SVG có thể chứa script: mở trực tiếp thì chạy trong sandbox, không tải được gì thêm
+SVG_CONTENT_SECURITY_POLICY = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+
+
+def _is_compressible(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in current_app.config["UPLOADS_PRECOMPRESS_EXTENSIONS"]
+
+
+def _write_atomic(path, data):
+    tmp_path = os.path.join(os.path.dirname(path), "." + os.path.basename(path))
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def precompress(path):
+    """
+    Tạo sẵn <file>.gz (và <file>.br nếu có brotli) cạnh file gốc cho các định dạng nén được.
+    Bản nào không nhỏ hơn file gốc thì bỏ. Trả về danh sách encoding đã tạo.
+    """
+    if not _is_compressible(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = [("gzip", ".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ("br", ".br", brotli.compress(data, quality=11)))
+    created = []
+    for encoding, suffix, compressed in variants:
+        if len(compressed) < len(data):
+            _write_atomic(path + suffix, compressed)
+            created.append(encoding)
+    return created
+
+
+def remove_precompressed(path):
+    for _, suffix in _ENCODINGS:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _pick_encoding(path):
+    for encoding, suffix in _ENCODINGS:
+        if request.accept_encodings[encoding] > 0 and os.path.isfile(path + suffix):
+            return encoding, suffix
+    return None, ""
+
+
+def _offload(mode, name, path, mimetype, etag):
+    """
+    Response chỉ có header, để proxy phía trước tự gửi file (kể cả Range).
+    304 vẫn được trả ngay ở đây để khỏi phải đi qua proxy lần nữa.
+    """
+    response = current_app.response_class(mimetype=mimetype)
+    if mode == "x-accel-redirect":
+        prefix = current_app.config["UPLOADS_ACCEL_PREFIX"].rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(name)}"
+    else:
+        response.headers["X-Sendfile"] = path
+    stat = os.stat(path)
+    response.last_modified = stat.st_mtime
+    response.set_etag(etag or f"{stat.st_mtime}-{stat.st_size}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def send_upload(name):
+    """
+    Gửi một file trong UPLOAD_FOLDER (name có thể nằm trong thư mục con, vd. variants/).
+    Hỗ trợ Range / If-Range / If-None-Match / If-Modified-Since; chọn bản .br/.gz nén sẵn nếu
+    client nhận; với UPLOADS_SENDFILE thì giao việc gửi file cho proxy.
+    Luôn kèm nosniff; SVG kèm thêm CSP sandbox để script trong file không chạy trên origin của app.
+    File lưu theo hash nội dung dùng chính tên file làm ETag mạnh (giống nhau trên mọi máy).
+    """
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    path = safe_join(upload_folder, name)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mode = current_app.config["UPLOADS_SENDFILE"]
+    mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    encoding, suffix = None, ""
+    compressible = _is_compressible(name)
+    # nginx không giữ Content-Encoding của response X-Accel-Redirect: để gzip_static / brotli_static
+    # ở location internal tự chọn bản nén
+    if compressible and mode != "x-accel-redirect":
+        encoding, suffix = _pick_encoding(path)
+    basename = os.path.basename(name)
+    etag = basename + suffix if is_immutable_upload(basename) else None
+
+    if mode:
+        response = _offload(mode, name + suffix, path + suffix, mimetype, etag)
+    else:
+        response = send_from_directory(upload_folder, name + suffix, mimetype=mimetype, etag=etag or True)
+    if encoding:
+        response.content_encoding = encoding
+    if compressible:
+        response.vary.add("Accept-Encoding")
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    if mimetype == "image/svg+xml":
+        response.headers["Content-Security-Policy"] = SVG_CONTENT_SECURITY_POLICY
+    return response
+
+
+def init_app(app):
+    mode = app.config.get("UPLOADS_SENDFILE")
+    if mode and mode not in SENDFILE_MODES:
+        raise ValueError(f"UPLOADS_SENDFILE must be one of {', '.join(SENDFILE_MODES)}, got {mode!r}")
+    app.cli.add_command(precompress_uploads_command)
+
+
+@click.command("precompress-uploads")
+@with_appcontext
+def precompress_uploads_command():
+    """
+    Tạo bản nén sẵn cho các file upload đã có (file mới được nén ngay khi upload).
+    """
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    count = 0
+    for entry in os.scandir(upload_folder):
+        if entry.is_file() and not entry.name.startswith(".") and precompress(entry.path):
+            count += 1
+    click.echo(f"Precompressed {count} upload(s)")
@@ -0,0 +1,176 @@
+import threading
+import unicodedata
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models import db, Card, Progress
+
+
+def normalize_answer(value):
+    """
+    Chuẩn hóa đáp án dạng chuỗi: NFC, bỏ khoảng trắng thừa, không phân biệt hoa thường.
+    """
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFC", str(value))
+    return " ".join(text.split()).casefold()
+
+
+def _option_text(option):
+    if isinstance(option, dict):
+        return option.get("text", "")
+    return option
+
+
+class AnswerKey:
+    """
+    Đáp án đã biên dịch sẵn của một quiz: mọi chuẩn hóa được làm một lần lúc dựng,
+    nên chấm mỗi bài chỉ còn tra dict và so sánh tập hợp.
+    """
+
+    def __init__(self, course_id, rows):
+        self.course_id = course_id
+        # card_id -> (loại câu hỏi, đáp án đúng đã chuẩn hóa, map text -> vị trí option)
+        self.entries = {}
+        for row in rows:
+            if row.question_type == "multipleChoice":
+                options = row.options or []
+                text_index = {normalize_answer(_option_text(o)): i for i, o in enumerate(options)}
+                correct = frozenset(
+                    i for i, o in enumerate(options) if isinstance(o, dict) and o.get("isCorrect")
+                )
+                if not correct and row.correct_answer:
+                    # Option dạng chuỗi: đáp án đúng nằm ở correctAnswer
+                    index = text_index.get(normalize_answer(row.correct_answer))
+                    correct = frozenset() if index is None else frozenset([index])
+                self.entries[row.id] = ("multipleChoice", correct, text_index)
+            else:
+                self.entries[row.id] = (row.question_type, normalize_answer(row.correct_answer), None)
+
+    @property
+    def total(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, course_id):
+        rows = db.session.execute(
+            select(Card.id, Card.question_type, Card.options, Card.correct_answer)
+            .where(Card.course_id == course_id)
+        ).all()
+        return cls(course_id, rows)
+
+    def _grade_one(self, entry, answer):
+        question_type, correct, text_index = entry
+        if question_type != "multipleChoice":
+            return normalize_answer(answer) == correct
+        if not isinstance(answer, list):
+            answer = [answer]
+        chosen = set()
+        for item in answer:
+            if isinstance(item, bool):
+                return False
+            if isinstance(item, int):
+                chosen.add(item)
+            else:
+                index = text_index.get(normalize_answer(item))
+                if index is None:
+                    return False
+                chosen.add(index)
+        return bool(correct) and chosen == correct
+
+    def grade(self, answers, detailed=True):
+        """
+        Chấm một bài làm. answers: {card_id: đáp án}; card không thuộc quiz bị bỏ qua.
+        """
+        answered = 0
+        correct = 0
+        results = {} if detailed else None
+        entries = self.entries
+        for card_id, answer in answers.items():
+            try:
+                entry = entries.get(int(card_id))
+            except (TypeError, ValueError):
+                entry = None
+            if entry is None:
+                continue
+            answered += 1
+            ok = self._grade_one(entry, answer)
+            correct += ok
+            if detailed:
+                results[str(card_id)] = ok
+        summary = {"total": self.total, "answered": answered, "correct": correct}
+        if detailed:
+            summary["results"] = results
+        return summary
+
+
+class AnswerKeyCache:
+    """
+    Cache AnswerKey theo course_id, gắn với Course.version lúc dựng: version khác (khóa học đã
+    được sửa, kể cả ở process khác) thì dựng lại. invalidate chỉ giải phóng sớm trong process hiện tại.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get("ANSWER_KEY_CACHE_MAXSIZE", self.maxsize)
+        self.clear()
+
+    def get(self, course_id, version):
+        """
+        version là Course.version đọc trước khi gọi (card được đọc sau nên không cũ hơn version).
+        """
+        with self._lock:
+            entry = self._data.get(course_id)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        key = AnswerKey.load(course_id)
+        with self._lock:
+            if course_id not in self._data and len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
+            self._data[course_id] = (version, key)
+        return key
+
+    def invalidate(self, course_id):
+        with self._lock:
+            self._data.pop(course_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+answer_key_cache = AnswerKeyCache()
+
+
+def upsert_progress(rows):
+    """
+    Cộng dồn studied/correct cho nhiều (user_id, course_id) trong một câu lệnh upsert.
+    rows: list dict {user_id, course_id, studied, correct}. Không commit.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    table = Progress.__table__
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            studied=table.c.studied + stmt.inserted.studied,
+            correct=table.c.correct + stmt.inserted.correct,
+        )
+    elif dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "course_id"],
+            set_={
+                "studied": table.c.studied + stmt.excluded.studied,
+                "correct": table.c.correct + stmt.excluded.correct,
+            },
+        )
+    else:
+        raise NotImplementedError(f"Progress upsert is not supported on {dialect}")
+    db.session.execute(stmt, rows)
@@ -0,0 +1,162 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from app.models import db, Course, StudyHistory, User
+from app.utils.rollups import add_to_rollups
+
+
+class HistoryBufferFull(Exception):
+    """
+    Bộ đệm đã có max_pending sự kiện chờ ghi (DB chậm / lỗi); route nên trả 503.
+    """
+
+
+class HistoryBuffer:
+    """
+    Gom các lượt học (StudyHistory) trong bộ nhớ rồi ghi thành một lệnh INSERT nhiều dòng khi
+    đủ flush_size sự kiện hoặc sau flush_interval giây, thay vì một transaction cho mỗi lượt.
+    Rollup theo ngày được cộng trong cùng transaction.
+    Cùng (user, course) lặp lại trong dedupe_window giây chỉ được ghi một lần.
+    Thread nền khởi động ở lần append đầu tiên; bộ đệm luôn được ghi nốt khi process thoát.
+    """
+
+    def __init__(self):
+        self.flush_size = 500
+        self.flush_interval = 2.0
+        self.dedupe_window = 60.0
+        self.max_pending = 10000
+        self._app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = []
+        self._last_seen = {}  # (user_id, course_id) -> thời điểm (monotonic) ghi nhận gần nhất
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.flushed = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        atexit.register(self.shutdown)
+
+    def init_app(self, app):
+        self._app = app
+        self.flush_size = app.config.get("HISTORY_FLUSH_SIZE", self.flush_size)
+        self.flush_interval = app.config.get("HISTORY_FLUSH_INTERVAL", self.flush_interval)
+        self.dedupe_window = app.config.get("HISTORY_DEDUPE_WINDOW", self.dedupe_window)
+        self.max_pending = app.config.get("HISTORY_MAX_PENDING", self.max_pending)
+
+    def _ensure_thread(self):
+        # Thread không sống qua fork (vd. gunicorn --preload): mỗi process tự khởi động lại
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="history-buffer", daemon=True)
+        self._thread.start()
+
+    def append(self, user_id, course_id, studied_at=None):
+        """
+        Thêm một lượt học. Trả về False nếu bị bỏ qua vì trùng trong cửa sổ dedupe;
+        báo HistoryBufferFull nếu bộ đệm đã đầy.
+        """
+        now = time.monotonic()
+        key = (user_id, course_id)
+        with self._lock:
+            last = self._last_seen.get(key)
+            if last is not None and now - last < self.dedupe_window:
+                self.deduplicated += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                raise HistoryBufferFull()
+            self._last_seen[key] = now
+            self._pending.append({
+                "user_id": user_id,
+                "course_id": course_id,
+                "studied_at": studied_at or datetime.utcnow(),
+            })
+            full = len(self._pending) >= self.flush_size
+            self._ensure_thread()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def has_pending(self, user_id):
+        with self._lock:
+            return any(row["user_id"] == user_id for row in self._pending)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Ghi toàn bộ sự kiện đang chờ bằng một transaction. Lượt học của course / user đã bị xóa được bỏ qua.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                self._prune_last_seen()
+            if not rows or self._app is None:
+                return 0
+            with self._app.app_context():
+                try:
+                    course_ids = {row["course_id"] for row in rows}
+                    existing = set(db.session.execute(
+                        select(Course.id).where(Course.id.in_(course_ids))
+                    ).scalars())
+                    user_ids = {row["user_id"] for row in rows}
+                    existing_users = set(db.session.execute(
+                        select(User.id).where(User.id.in_(user_ids))
+                    ).scalars())
+                    rows = [row for row in rows if row["course_id"] in existing and row["user_id"] in existing_users]
+                    if rows:
+                        db.session.execute(insert(StudyHistory), rows)
+                        add_to_rollups(rows)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self._app.logger.error(f"Failed to flush {len(rows)} study history event(s): {str(e)}")
+                    self._requeue(rows)
+                    return 0
+            with self._lock:
+                self.flushed += len(rows)
+            return len(rows)
+
+    def _requeue(self, rows):
+        # Giữ lại để thử ở lần ghi sau, nhưng không để bộ đệm phình vô hạn khi DB lỗi kéo dài
+        with self._lock:
+            room = max(self.max_pending - len(self._pending), 0)
+            self._pending[:0] = rows[:room]
+            self.dropped += max(len(rows) - room, 0)
+
+    def _prune_last_seen(self):
+        cutoff = time.monotonic() - self.dedupe_window
+        stale = [key for key, seen in self._last_seen.items() if seen < cutoff]
+        for key in stale:
+            del self._last_seen[key]
+
+    def shutdown(self):
+        self._stopping = True
+        self._wakeup.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "flushed": self.flushed,
+                "deduplicated": self.deduplicated,
+                "dropped": self.dropped,
+            }
+
+
+history_buffer = HistoryBuffer()
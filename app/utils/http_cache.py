@@ -0,0 +1,72 @@
+import re
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from app.models import db, Course
+
+# Tên file trong kho theo hash nội dung (và bản thu nhỏ của nó): nội dung không bao giờ đổi
+_IMMUTABLE_UPLOAD = re.compile(r"^[0-9a-f]{64}(-\d+)?(\.[A-Za-z0-9]+)?$")
+
+
+def is_immutable_upload(filename):
+    return bool(_IMMUTABLE_UPLOAD.match(filename))
+
+
+def course_etag(scope, can_access, private=True):
+    """
+    Decorator trả 304 cho GET theo course_id mà không cần nạp/serialize card.
+    ETag mạnh dựng từ Course.version (tăng ở mọi thao tác ghi), chỉ tốn một truy vấn một dòng.
+    can_access(current_user, row) kiểm tra quyền trên dòng đó; nếu không có quyền (hoặc course
+    không tồn tại) thì để view tự trả lỗi như bình thường.
+    Với route có token_required, decorator này phải nằm dưới token_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            course_id = kwargs["course_id"]
+            current_user = args[0] if args else None
+            row = db.session.query(
+                Course.version, Course.updated_at, Course.owner_id, Course.is_published
+            ).filter(Course.id == course_id).first()
+            if row is None or not can_access(current_user, row):
+                return f(*args, **kwargs)
+
+            etag = f"{scope}-{course_id}-{row.version or 0}"
+            not_modified = request.if_none_match.contains_weak(etag) if request.if_none_match else (
+                row.updated_at is not None and request.if_modified_since is not None
+                and row.updated_at.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+            )
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # Bản nén gzip khác bytes với bản gốc nên chỉ là weak ETag
+            response.set_etag(etag, weak=bool(response.content_encoding))
+            if row.updated_at is not None:
+                response.last_modified = row.updated_at
+            # Luôn hỏi lại server (rẻ nhờ 304), không để cache dùng bản cũ
+            response.cache_control.no_cache = True
+            if private:
+                response.cache_control.private = True
+                response.vary.add("Authorization")
+            else:
+                response.cache_control.public = True
+            return response
+        return decorated_function
+    return decorator
+
+
+def owner_or_admin(current_user, row):
+    return current_user.role == "ADMIN" or row.owner_id == current_user.id
+
+
+def owner_only(current_user, row):
+    return row.owner_id == current_user.id
+
+
+def published_only(current_user, row):
+    return bool(row.is_published)
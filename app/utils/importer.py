@@ -0,0 +1,180 @@
+import codecs
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app.models import db, Card
+from app.utils.cards import build_card_rows, next_card_position
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Tên cột được chấp nhận trong file import -> khóa của câu hỏi (giống body của /publish)
+_FIELD_ALIASES = {
+    "questiontext": "questionText", "question": "questionText", "front": "questionText",
+    "type": "type",
+    "options": "options",
+    "correctanswer": "correctAnswer", "answer": "correctAnswer",
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(filename, mimetype, requested=None):
+    if requested:
+        return requested.lower() if requested.lower() in IMPORT_FORMATS else None
+    name = (filename or "").lower()
+    if name.endswith(".csv") or mimetype == "text/csv":
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or mimetype in ("application/x-ndjson", "application/jsonl"):
+        return "jsonl"
+    return None
+
+
+def _normalize_keys(raw):
+    return {
+        _FIELD_ALIASES[key.strip().lower()]: value
+        for key, value in raw.items()
+        if isinstance(key, str) and key.strip().lower() in _FIELD_ALIASES
+    }
+
+
+def iter_csv_rows(stream):
+    """
+    Đọc CSV từ stream nhị phân từng dòng một. Trả về (số dòng, dict hoặc RowError).
+    Cột options là mảng JSON hoặc các lựa chọn ngăn cách bởi "|".
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from _read_csv(csv.DictReader(text))
+    finally:
+        text.detach()  # Không đóng stream của request khi wrapper bị hủy
+
+
+def _read_csv(reader):
+    while True:
+        try:
+            raw = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield reader.line_num, RowError(f"Unreadable CSV row: {str(e)}")
+            continue
+        row = _normalize_keys(raw)
+        options = (row.get("options") or "").strip()
+        if options.startswith("["):
+            try:
+                row["options"] = json.loads(options)
+            except ValueError:
+                yield reader.line_num, RowError("options is not a valid JSON array")
+                continue
+        else:
+            row["options"] = [o.strip() for o in options.split("|") if o.strip()]
+        yield reader.line_num, row
+
+
+def iter_jsonl_rows(stream):
+    """
+    Đọc JSON Lines từ stream nhị phân, mỗi dòng một câu hỏi. Dòng trống được bỏ qua.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="strict")
+    for line_no, line in enumerate(stream, start=1):
+        try:
+            line = decoder.decode(line)
+        except UnicodeDecodeError:
+            yield line_no, RowError("Line is not valid UTF-8")
+            decoder.reset()
+            continue
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f"Invalid JSON: {str(e)}")
+            continue
+        if not isinstance(raw, dict):
+            yield line_no, RowError("Each line must be a JSON object")
+            continue
+        yield line_no, _normalize_keys(raw)
+
+
+def validate_question(row):
+    """
+    Kiểm tra một câu hỏi và trả về dict đúng định dạng build_card_rows, hoặc raise RowError.
+    """
+    question_text = row.get("questionText")
+    question_type = row.get("type")
+    if not isinstance(question_text, str) or not question_text.strip():
+        raise RowError("questionText is required")
+    if not isinstance(question_type, str) or not question_type.strip():
+        raise RowError("type is required")
+
+    options = row.get("options") or []
+    correct_answer = row.get("correctAnswer")
+    correct_answer = "" if correct_answer is None else str(correct_answer)
+    if not isinstance(options, list):
+        raise RowError("options must be a list")
+    if question_type == "multipleChoice" and not options:
+        raise RowError("multipleChoice questions need at least one option")
+    if question_type == "fillInTheBlank" and not correct_answer.strip():
+        raise RowError("fillInTheBlank questions need a correctAnswer")
+
+    return {
+        "questionText": question_text.strip(),
+        "type": question_type.strip(),
+        "options": options,
+        "correctAnswer": correct_answer,
+    }
+
+
+def import_cards(course_id, rows, batch_size, max_errors):
+    """
+    Chèn câu hỏi theo lô batch_size dòng, mỗi lô một transaction. Dòng lỗi được ghi lại
+    (tối đa max_errors lỗi chi tiết) và bỏ qua; lô lỗi DB chỉ làm hỏng chính lô đó.
+    Bộ nhớ dùng chỉ phụ thuộc batch_size, không phụ thuộc kích thước file.
+    """
+    result = {"imported": 0, "failed": 0, "errors": []}
+
+    def record_error(line_no, message):
+        result["failed"] += 1
+        if len(result["errors"]) < max_errors:
+            result["errors"].append({"line": line_no, "error": message})
+
+    # Câu hỏi import được nối vào sau các câu hỏi hiện có, theo thứ tự trong file
+    position = next_card_position(course_id)
+
+    def flush(batch):
+        nonlocal position
+        try:
+            db.session.execute(insert(Card), build_card_rows(course_id, [q for _, q in batch], position))
+            position += len(batch)
+            db.session.commit()
+            result["imported"] += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error importing cards into course {course_id}: {str(e)}")
+            for line_no, _ in batch:
+                record_error(line_no, "Database error while saving this batch")
+
+    batch = []
+    for line_no, row in rows:
+        if isinstance(row, RowError):
+            record_error(line_no, str(row))
+            continue
+        try:
+            batch.append((line_no, validate_question(row)))
+        except RowError as e:
+            record_error(line_no, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    result["errors_truncated"] = result["failed"] > len(result["errors"])
+    return result
@@ -0,0 +1,235 @@
+import hmac
+import ipaddress
+import threading
+import time
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Mốc histogram (giây / số câu lệnh / byte)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _address_allowed(address, networks):
+    try:
+        ip = ipaddress.ip_address(address or "")
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(network.strip(), strict=False) for network in networks if network.strip())
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [đếm theo từng mốc..., +Inf, tổng]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class RequestMetrics:
+    """
+    Đo mỗi request: thời gian xử lý, số câu lệnh SQL, thời gian DB và kích thước response,
+    gom theo endpoint (URL rule). Số liệu nằm trong từng process và được xuất ở /metrics
+    theo định dạng văn bản của Prometheus.
+    Ở chế độ debug, request chạy quá QUERY_BUDGET câu lệnh SQL sẽ bị ghi cảnh báo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats_sources = {}
+        self._listened_engines = set()
+        self.enabled = True
+        self.query_budget = 0
+        self.warn_budget = False
+        self._reset()
+
+    def _reset(self):
+        labels = ("method", "endpoint")
+        self.requests = Counter("http_requests_total", "HTTP requests handled.", labels + ("status",))
+        self.latency = Histogram("http_request_duration_seconds", "Request latency.", labels, LATENCY_BUCKETS)
+        self.queries = Histogram("http_request_sql_queries", "SQL statements per request.", labels, QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram("http_request_db_seconds", "Time spent in SQL per request.", labels, LATENCY_BUCKETS)
+        self.size = Histogram("http_response_size_bytes", "Response body size.", labels, SIZE_BUCKETS)
+        self.budget_exceeded = Counter("http_request_query_budget_exceeded_total",
+                                       "Requests that ran more SQL statements than QUERY_BUDGET.", labels)
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        self.query_budget = app.config.get("QUERY_BUDGET", 0)
+        self.warn_budget = app.config.get("QUERY_BUDGET_WARN", app.debug)
+        with self._lock:
+            self._reset()
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self._metrics_view)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                if id(engine) in self._listened_engines:
+                    continue
+                self._listened_engines.add(id(engine))
+                event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def register_stats(self, prefix, source):
+        """
+        Xuất thêm các số liệu dạng dict (vd. user_cache.stats) thành <prefix>_<khóa>.
+        """
+        self._stats_sources[prefix] = source
+
+    # --- SQLAlchemy hooks ---
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if has_request_context() and "metrics_started" in g:
+            g.metrics_queries += 1
+            g.metrics_db_time += elapsed
+
+    # --- Flask hooks ---
+    @staticmethod
+    def _before_request():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_time = 0.0
+
+    def _after_request(self, response):
+        if "metrics_started" not in g or request.endpoint == "metrics":
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        endpoint = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        labels = (request.method, endpoint)
+        # Response dạng stream: chỉ dùng Content-Length nếu có (file), không đọc body để đo
+        size = response.content_length if response.is_streamed else response.calculate_content_length()
+        over_budget = bool(self.query_budget) and g.metrics_queries > self.query_budget
+
+        with self._lock:
+            self.requests.inc(labels + (str(response.status_code),))
+            self.latency.observe(labels, elapsed)
+            self.queries.observe(labels, g.metrics_queries)
+            self.db_time.observe(labels, g.metrics_db_time)
+            if size is not None:
+                self.size.observe(labels, size)
+            if over_budget:
+                self.budget_exceeded.inc(labels)
+
+        if over_budget and self.warn_budget:
+            current_app.logger.warning(
+                f"Query budget exceeded: {request.method} {endpoint} ran {g.metrics_queries} SQL statements "
+                f"(budget {self.query_budget}, {g.metrics_db_time * 1000:.1f} ms in DB)"
+            )
+        if current_app.debug:
+            response.headers["X-Query-Count"] = str(g.metrics_queries)
+        return response
+
+    def _metrics_view(self):
+        # Có METRICS_TOKEN thì cần Bearer token; không có thì chỉ mở cho METRICS_ALLOWED_NETWORKS
+        token = current_app.config.get("METRICS_TOKEN")
+        if token:
+            supplied = (request.headers.get("Authorization") or "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied.encode(), token.encode()):
+                return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        elif not _address_allowed(request.remote_addr, current_app.config["METRICS_ALLOWED_NETWORKS"]):
+            return Response("Forbidden\n", status=403, mimetype="text/plain")
+        return Response(self.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in (self.requests, self.latency, self.queries, self.db_time, self.size, self.budget_exceeded):
+                lines.extend(metric.render())
+        for prefix, source in sorted(self._stats_sources.items()):
+            try:
+                stats = source()
+            except Exception as e:
+                current_app.logger.error(f"Failed to collect {prefix} metrics: {str(e)}")
+                continue
+            for key, value in sorted(_flatten(stats)):
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} untyped")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(stats, prefix=""):
+    # {"checkout_wait": {"timeouts": 0}} -> ("checkout_wait_timeouts", 0); bỏ giá trị không phải số
+    for key, value in stats.items():
+        name = f"{prefix}{key}".replace("-", "_").replace(".", "_")
+        if isinstance(value, dict):
+            yield from _flatten(value, name + "_")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+request_metrics = RequestMetrics()
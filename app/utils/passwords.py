@@ -0,0 +1,110 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """
+    Hàng đợi băm mật khẩu đã đầy; route nên trả 503 để client thử lại sau.
+    """
+
+
+class PasswordHasher:
+    """
+    Băm / kiểm tra mật khẩu trong một process pool có giới hạn, để các request khác của
+    worker không bị chặn bởi phép băm tốn CPU. Số việc chờ tối đa là max_pending;
+    vượt quá thì chờ tối đa queue_timeout giây rồi báo HasherBusy (backpressure).
+    workers = 0 thì băm ngay trên thread của request (dùng khi test).
+    """
+
+    def __init__(self):
+        self.method = "scrypt:32768:8:1"
+        self.method_prefix = self.method
+        self.workers = 0
+        self.queue_timeout = 2.0
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        # werkzeug mở rộng tên viết tắt ("scrypt" -> "scrypt:32768:8:1"): so với dạng đầy đủ
+        # đúng như nó được ghi vào hash, nếu không mọi lần đăng nhập đều băm lại
+        self.method_prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.queue_timeout = app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", self.queue_timeout)
+        self._slots = threading.BoundedSemaphore(app.config.get("PASSWORD_HASH_MAX_PENDING", 32))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        with self._lock:
+            self._reset_stats()
+
+    def _get_executor(self):
+        if self._executor is None and self.workers > 0:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: fork khi các thread nền (history buffer, thumbnail) đang chạy có thể
+                    # sao chép cả lock đang bị giữ vào process con
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        started = time.perf_counter()
+        with self._lock:
+            self.pending += 1
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return func(*args)
+            return executor.submit(func, *args).result()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash or password is None:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # Định dạng của werkzeug: "<method>$<salt>$<hash>"
+        return bool(pwhash) and pwhash.split("$", 1)[0] != self.method_prefix
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "latency_seconds_total": self.latency_total,
+                "latency_seconds_max": self.latency_max,
+            }
+
+
+password_hasher = PasswordHasher()
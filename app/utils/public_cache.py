@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class PublicPageCache:
+    """
+    Cache trang đầu (đã serialize) của danh sách khóa học công khai, theo từng limit.
+    Bị xóa khi publish/xóa/sửa khóa học; TTL chỉ là lưới an toàn khi chạy nhiều process.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._data = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("PUBLIC_COURSES_CACHE_TTL", self.ttl)
+        self.invalidate()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, key, value, generation):
+        # Bỏ qua nếu cache đã bị invalidate trong lúc đang truy vấn
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+
+public_courses_cache = PublicPageCache()
@@ -0,0 +1,95 @@
+import gzip
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models import db, Course, QuizSnapshot
+from app.utils.cards import load_course_cards
+
+SNAPSHOT_PARTS = ("details", "questions")
+
+
+def build_snapshot(course):
+    """
+    Serialize thông tin quiz và toàn bộ câu hỏi đúng như các route công khai trả về,
+    kèm bản gzip. Gắn với course.version hiện tại nên course phải được đọc trước các card.
+    """
+    level = current_app.config["QUIZ_SNAPSHOT_GZIP_LEVEL"]
+    values = {"course_id": course.id, "version": course.version or 0, "created_at": datetime.utcnow()}
+    for part, data in (("details", course.to_dict()), ("questions", load_course_cards(course.id))):
+        body = current_app.json.dumps(data).encode("utf-8")
+        values[part] = body
+        # mtime=0: cùng nội dung thì cùng bytes
+        values[f"{part}_gzip"] = gzip.compress(body, compresslevel=level, mtime=0)
+    return values
+
+
+def save_snapshot(values):
+    """
+    Ghi đè snapshot của khóa học bằng upsert, luôn vào DB chính (kể cả trong read_replica). Không commit.
+    """
+    table = QuizSnapshot.__table__
+    dialect = db.engine.dialect.name
+    columns = {key: value for key, value in values.items() if key != "course_id"}
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(**values).on_duplicate_key_update(**columns)
+    elif dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=["course_id"], set_=columns)
+    else:
+        raise NotImplementedError(f"Snapshot upsert is not supported on {dialect}")
+    db.session.execute(stmt, bind_arguments={"bind": db.engine})
+
+
+def publish_snapshot(course):
+    """
+    Dựng và ghi snapshot trong transaction của lần publish. Không commit.
+    """
+    db.session.flush()
+    save_snapshot(build_snapshot(course))
+
+
+def load_snapshot(course_id, part, gzipped):
+    """
+    Bytes của snapshot (part là "details" hoặc "questions") bằng một lần đọc theo khóa chính.
+    Snapshot cũ hơn Course.version (khóa học bị sửa sau khi publish) hoặc chưa có thì được dựng lại.
+    Trả về None nếu quiz không tồn tại hoặc chưa xuất bản.
+    """
+    column = getattr(QuizSnapshot, f"{part}_gzip" if gzipped else part)
+    body = db.session.execute(
+        select(column)
+        .join(Course, Course.id == QuizSnapshot.course_id)
+        .where(
+            QuizSnapshot.course_id == course_id,
+            QuizSnapshot.version == Course.version,
+            Course.is_published.is_(True),
+        )
+    ).scalar()
+    if body is not None:
+        return body
+
+    course = Course.query.filter_by(id=course_id, is_published=True).first()
+    if course is None:
+        return None
+    values = build_snapshot(course)
+    try:
+        save_snapshot(values)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error saving quiz snapshot {course_id}: {str(e)}")
+    return values[column.key]
+
+
+def accepts_gzip():
+    return request.accept_encodings["gzip"] > 0
+
+
+def snapshot_response(body, gzipped):
+    response = current_app.response_class(body, mimetype="application/json")
+    if gzipped:
+        response.content_encoding = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,193 @@
+import math
+import re
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+try:
+    import redis
+except ImportError:  # redis là tùy chọn: không có thì chỉ dùng bộ đếm trong process
+    redis = None
+
+
+class MemoryBackend:
+    """
+    Bộ đếm cửa sổ trượt trong process: mỗi key chỉ giữ [chỉ số cửa sổ, số lần ở cửa sổ hiện tại,
+    số lần ở cửa sổ trước]. Key không còn hoạt động quá hai cửa sổ bị quét bỏ định kỳ.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys=100000, sweep_interval=60):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._counters = {}  # key -> [window_index, current, previous, expires_at]
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = [index, 0, 0, 0.0]
+                self._counters[key] = entry
+            elif entry[0] == index - 1:
+                entry[0], entry[1], entry[2] = index, 0, entry[1]
+            entry[1] += 1
+            entry[3] = (index + 2) * window
+            current, previous = entry[1], entry[2]
+            if now >= self._next_sweep or len(self._counters) > self.max_keys:
+                self._sweep(now)
+        return current, previous
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def _sweep(self, now):
+        expired = [key for key, entry in self._counters.items() if entry[3] <= now]
+        for key in expired:
+            del self._counters[key]
+        # Vẫn quá giới hạn: bỏ các key cũ nhất (dict giữ thứ tự chèn)
+        overflow = len(self._counters) - self.max_keys
+        if overflow > 0:
+            for key in list(self._counters)[:overflow]:
+                del self._counters[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class RedisBackend:
+    """
+    Bộ đếm dùng chung giữa các worker/process qua Redis (INCR theo từng cửa sổ, tự hết hạn).
+    """
+
+    name = "redis"
+
+    def __init__(self, url, prefix="ratelimit:"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        current_key = f"{self.prefix}{key}:{index}"
+        pipe = self.client.pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, int(window * 2))
+        pipe.get(f"{self.prefix}{key}:{index - 1}")
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def reset(self, key):
+        # key chứa dữ liệu người dùng (username): thoát ký tự glob, và chỉ xóa đúng các khóa
+        # <key>:<số cửa sổ> để "alice" không xóa nhầm bộ đếm của "alice:x"
+        base = f"{self.prefix}{key}:"
+        pattern = re.sub(r"([\\*?\[\]])", r"\\\1", base) + "*"
+        keys = [
+            k for k in self.client.scan_iter(pattern)
+            if k.decode()[len(base):].isdigit()
+        ]
+        if keys:
+            self.client.delete(*keys)
+
+
+class RateLimiter:
+    """
+    Giới hạn số lần gọi các endpoint xác thực theo IP và theo username, kiểm tra trước mọi
+    truy vấn DB hay phép băm mật khẩu. Quy tắc lấy từ RATE_LIMITS:
+    {scope: ((kind, limit, window_seconds), ...)} với kind là "ip" hoặc "username".
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.rules = {}
+        self.backend = MemoryBackend()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATE_LIMIT_ENABLED", True)
+        self.rules = app.config.get("RATE_LIMITS", {})
+        url = app.config.get("RATE_LIMIT_STORAGE_URL")
+        if url and url.startswith("redis://"):
+            if redis is None:
+                app.logger.error("RATE_LIMIT_STORAGE_URL is set but redis is not installed; using in-process counters")
+                self.backend = MemoryBackend(app.config.get("RATE_LIMIT_MAX_KEYS", 100000))
+            else:
+                self.backend = RedisBackend(url)
+        else:
+            self.backend = MemoryBackend(app.config.get("RATE_LIMIT_MAX_KEYS", 100000))
+        with self._lock:
+            self.rejected = 0
+
+    @staticmethod
+    def _identity(kind):
+        if kind == "ip":
+            return request.remote_addr or "unknown"
+        if kind == "username":
+            data = request.get_json(silent=True) or {}
+            username = data.get("username") if isinstance(data, dict) else None
+            if not isinstance(username, str) or not username.strip():
+                return None
+            return username.strip().casefold()
+        raise ValueError(f"Unknown rate limit key: {kind}")
+
+    def check(self, scope):
+        """
+        Ghi nhận một lần gọi; trả về số giây cần chờ nếu vượt giới hạn, ngược lại None.
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        retry_after = None
+        for kind, limit, window in self.rules.get(scope, ()):
+            identity = self._identity(kind)
+            if identity is None:
+                continue
+            current, previous = self.backend.hit(f"{scope}:{kind}:{identity}", window, now)
+            # Ước lượng cửa sổ trượt: phần còn lại của cửa sổ trước + cửa sổ hiện tại
+            elapsed = (now % window) / window
+            if previous * (1 - elapsed) + current > limit:
+                wait = math.ceil(window - now % window)
+                retry_after = max(retry_after or 0, wait)
+        if retry_after is not None:
+            with self._lock:
+                self.rejected += 1
+        return retry_after
+
+    def reset(self, scope, kind, identity):
+        self.backend.reset(f"{scope}:{kind}:{identity.strip().casefold()}")
+
+    def stats(self):
+        with self._lock:
+            rejected = self.rejected
+        stats = {"backend": self.backend.name, "rejected": rejected}
+        if isinstance(self.backend, MemoryBackend):
+            stats["keys"] = len(self.backend)
+        return stats
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limited(scope):
+    """
+    Decorator: trả 429 kèm Retry-After trước khi route chạy nếu vượt giới hạn của scope.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            retry_after = rate_limiter.check(scope)
+            if retry_after is not None:
+                current_app.logger.warning(f"Rate limit exceeded for {scope} from {request.remote_addr}")
+                response = jsonify({"error": "Quá nhiều yêu cầu, vui lòng thử lại sau"})
+                response.headers["Retry-After"] = str(retry_after)
+                return response, 429
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
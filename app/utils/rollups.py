@@ -0,0 +1,124 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models import db, StudyHistory, StudyRollup
+
+
+def add_to_rollups(rows):
+    """
+    Cộng các lượt học (dict user_id, course_id, studied_at) vào bảng rollup theo ngày bằng
+    một câu lệnh upsert. Gọi trong cùng transaction với lệnh ghi study_history. Không commit.
+    """
+    counts = Counter((row["user_id"], row["course_id"], row["studied_at"].date()) for row in rows)
+    if not counts:
+        return
+    values = [
+        {"user_id": user_id, "course_id": course_id, "day": day, "events": events}
+        for (user_id, course_id, day), events in counts.items()
+    ]
+    dialect = db.session.get_bind().dialect.name
+    table = StudyRollup.__table__
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(events=table.c.events + stmt.inserted.events)
+    elif dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "course_id", "day"],
+            set_={"events": table.c.events + stmt.excluded.events},
+        )
+    else:
+        raise NotImplementedError(f"Rollup upsert is not supported on {dialect}")
+    db.session.execute(stmt, values)
+
+
+def compact_history(retention_days, batch_size=5000):
+    """
+    Xóa các dòng study_history cũ hơn retention_days ngày theo từng lô (mỗi lô một transaction).
+    Mọi lượt học đã được cộng vào rollup lúc ghi nên không mất số liệu theo ngày.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            select(StudyHistory.id).where(StudyHistory.studied_at < cutoff)
+            .order_by(StudyHistory.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(delete(StudyHistory).where(StudyHistory.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+
+
+def _streaks(active_days, today):
+    """
+    (chuỗi hiện tại, chuỗi dài nhất) từ danh sách ngày có học đã sắp tăng dần.
+    Chuỗi hiện tại vẫn tính nếu hôm nay chưa học nhưng hôm qua có.
+    """
+    longest = run = 0
+    previous = None
+    for day in active_days:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous is not None and today - previous <= timedelta(days=1) else 0
+    return current, longest
+
+
+def activity_summary(user_id, days, course_id=None):
+    """
+    Heatmap (số lượt học mỗi ngày có học) và streak của user trong days ngày gần nhất,
+    đọc từ rollup: chi phí theo số ngày, không theo số lượt học.
+    """
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    query = (
+        select(StudyRollup.day, func.sum(StudyRollup.events).label("events"))
+        .where(StudyRollup.user_id == user_id, StudyRollup.day >= start)
+        .group_by(StudyRollup.day)
+        .order_by(StudyRollup.day)
+    )
+    if course_id is not None:
+        query = query.where(StudyRollup.course_id == course_id)
+    rows = db.session.execute(query).all()
+
+    heatmap = []
+    for row in rows:
+        # SQLite trả về chuỗi khi dùng GROUP BY trên cột Date
+        day = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day))
+        heatmap.append((day, int(row.events)))
+    current, longest = _streaks([day for day, _ in heatmap], today)
+
+    return {
+        "from": start.isoformat(),
+        "to": today.isoformat(),
+        "days": days,
+        "total_events": sum(events for _, events in heatmap),
+        "active_days": len(heatmap),
+        "current_streak": current,
+        "longest_streak": longest,
+        "heatmap": [{"date": day.isoformat(), "count": events} for day, events in heatmap],
+    }
+
+
+def init_app(app):
+    app.cli.add_command(compact_history_command)
+
+
+@click.command("compact-history")
+@click.option("--days", type=int, default=None, help="Keep raw rows newer than this many days.")
+@with_appcontext
+def compact_history_command(days):
+    """
+    Xóa study_history cũ hơn HISTORY_RETENTION_DAYS ngày (số liệu theo ngày vẫn nằm trong rollup).
+    """
+    retention = days if days is not None else current_app.config["HISTORY_RETENTION_DAYS"]
+    deleted = compact_history(retention, current_app.config["HISTORY_COMPACT_BATCH_SIZE"])
+    click.echo(f"Deleted {deleted} study history row(s) older than {retention} day(s)")
@@ -0,0 +1,295 @@
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, text
+
+from app.models import db, Course, Card
+
+# Trọng số của từng trường khi xếp hạng
+FIELD_WEIGHTS = {"name": 10.0, "description": 3.0, "cards": 1.0}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(value):
+    """
+    Tách từ, bỏ dấu (tiếng Việt "Hà Nội" -> "ha", "noi") và không phân biệt hoa thường.
+    Dùng cho cả nội dung được index lẫn truy vấn, ở mọi backend.
+    """
+    if not value:
+        return []
+    decomposed = unicodedata.normalize("NFKD", value.replace("đ", "d").replace("Đ", "D"))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(stripped.casefold())
+
+
+def _fold(value):
+    # Văn bản đã qua tokenize: FTS5 unicode61 không gộp "đ" -> "d" nên phải index sẵn dạng này
+    return " ".join(tokenize(value))
+
+
+def _load_document(course_id):
+    course = db.session.execute(
+        select(Course.name, Course.description).where(Course.id == course_id)
+    ).first()
+    if course is None:
+        return None
+    fronts = db.session.execute(select(Card.front).where(Card.course_id == course_id)).scalars()
+    return {
+        "name": course.name or "",
+        "description": course.description or "",
+        "cards": "\n".join(front for front in fronts if front),
+    }
+
+
+def _iter_documents():
+    # Toàn bộ bảng bằng hai truy vấn, dùng khi dựng lại chỉ mục
+    fronts = defaultdict(list)
+    for course_id, front in db.session.execute(select(Card.course_id, Card.front).order_by(Card.id)).all():
+        if front:
+            fronts[course_id].append(front)
+    for row in db.session.execute(select(Course.id, Course.name, Course.description)).all():
+        yield row.id, {
+            "name": row.name or "",
+            "description": row.description or "",
+            "cards": "\n".join(fronts.pop(row.id, ())),
+        }
+
+
+class Fts5Backend:
+    """
+    Chỉ mục SQLite FTS5 (bảng ảo course_search, rowid = course id). Nội dung được lưu ở dạng
+    đã tokenize() để khớp đúng với từ truy vấn. Bảng được tạo và nạp dữ liệu bằng migration.
+    """
+
+    name = "fts5"
+
+    @staticmethod
+    def table_exists():
+        return db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_search'"
+        )).first() is not None
+
+    def upsert(self, course_id, document):
+        db.session.execute(text("DELETE FROM course_search WHERE rowid = :id"), {"id": course_id})
+        db.session.execute(
+            text("INSERT INTO course_search (rowid, name, description, cards) VALUES (:id, :name, :description, :cards)"),
+            {"id": course_id, **{field: _fold(document[field]) for field in FIELD_WEIGHTS}},
+        )
+
+    def remove(self, course_id):
+        db.session.execute(text("DELETE FROM course_search WHERE rowid = :id"), {"id": course_id})
+
+    def clear(self):
+        db.session.execute(text("DELETE FROM course_search"))
+
+    def search(self, terms, limit, offset):
+        # Mỗi từ là một tiền tố: "ha"* "no"*  (AND giữa các từ)
+        match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+        rows = db.session.execute(text(
+            f"SELECT course_search.rowid AS course_id, bm25(course_search, {weights}) AS rank "
+            "FROM course_search JOIN courses ON courses.id = course_search.rowid "
+            "WHERE course_search MATCH :match AND courses.is_published = 1 "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset}).all()
+        # bm25 càng âm càng khớp; đổi dấu để điểm cao là tốt
+        return [(row.course_id, -row.rank) for row in rows]
+
+
+class MemoryBackend:
+    """
+    Chỉ mục ngược trong bộ nhớ cho CSDL không có FTS5. Mỗi process giữ bản riêng, được
+    dựng lại từ DB ở lần dùng đầu tiên rồi chỉ cập nhật theo các thao tác ghi của chính process đó:
+    với nhiều worker, thay đổi ở worker khác không thấy được cho tới khi process khởi động lại.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)  # term -> {course_id: điểm theo trọng số trường}
+        self._doc_terms = {}  # course_id -> tập term, để xóa nhanh
+        self._sorted_terms = []  # Để tìm theo tiền tố bằng bisect
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for course_id, document in _iter_documents():
+                self._index(course_id, document)
+            self._loaded = True
+
+    def _index(self, course_id, document):
+        self._remove(course_id)
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(document[field]):
+                weights[term] += weight
+        for term, weight in weights.items():
+            postings = self._postings[term]
+            if not postings:
+                bisect.insort(self._sorted_terms, term)
+            postings[course_id] = weight
+        self._doc_terms[course_id] = set(weights)
+
+    def _remove(self, course_id):
+        for term in self._doc_terms.pop(course_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(course_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._sorted_terms, term)
+                if index < len(self._sorted_terms) and self._sorted_terms[index] == term:
+                    del self._sorted_terms[index]
+
+    def upsert(self, course_id, document):
+        self._ensure_loaded()
+        with self._lock:
+            self._index(course_id, document)
+
+    def remove(self, course_id):
+        with self._lock:
+            self._remove(course_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._sorted_terms = []
+            self._loaded = True
+
+    def search(self, terms, limit, offset):
+        self._ensure_loaded()
+        with self._lock:
+            total_docs = max(len(self._doc_terms), 1)
+            scores = None
+            for term in terms:
+                # Gộp mọi term có tiền tố là từ truy vấn, lấy điểm cao nhất cho mỗi course
+                term_scores = {}
+                index = bisect.bisect_left(self._sorted_terms, term)
+                while index < len(self._sorted_terms) and self._sorted_terms[index].startswith(term):
+                    postings = self._postings[self._sorted_terms[index]]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for course_id, weight in postings.items():
+                        score = (1 + math.log(weight)) * idf
+                        if score > term_scores.get(course_id, 0.0):
+                            term_scores[course_id] = score
+                    index += 1
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {cid: s + term_scores[cid] for cid, s in scores.items() if cid in term_scores}
+                if not scores:
+                    return []
+        if not scores:
+            return []
+        published = set(db.session.execute(
+            select(Course.id).where(Course.id.in_(scores.keys()), Course.is_published.is_(True))
+        ).scalars())
+        ranked = sorted(
+            ((cid, score) for cid, score in scores.items() if cid in published),
+            key=lambda item: (-item[1], -item[0]),
+        )
+        return ranked[offset:offset + limit]
+
+
+class SearchIndex:
+    """
+    Chỉ mục tìm kiếm khóa học (tên, mô tả, mặt trước card). Dùng FTS5 khi chạy trên SQLite và
+    đã có bảng course_search (flask db upgrade), ngược lại dùng chỉ mục trong bộ nhớ
+    (riêng từng process, xem MemoryBackend).
+    Được cập nhật từ các thao tác ghi sau khi commit.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._backend = None
+        app.cli.add_command(rebuild_search_index_command)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._create_backend()
+        return self._backend
+
+    @staticmethod
+    def _create_backend():
+        if db.engine.dialect.name == "sqlite":
+            if Fts5Backend.table_exists():
+                return Fts5Backend()
+            current_app.logger.warning("course_search table not found (run flask db upgrade), using in-memory search index")
+        return MemoryBackend()
+
+    def reindex_course(self, course_id):
+        """
+        Đọc lại course và card của nó rồi cập nhật chỉ mục. Lỗi chỉ được ghi log.
+        """
+        try:
+            document = _load_document(course_id)
+            if document is None:
+                self.backend.remove(course_id)
+            else:
+                self.backend.upsert(course_id, document)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to index course {course_id}: {str(e)}")
+
+    def remove_course(self, course_id):
+        try:
+            self.backend.remove(course_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to remove course {course_id} from search index: {str(e)}")
+
+    def remove_courses(self, course_ids):
+        for course_id in course_ids:
+            self.remove_course(course_id)
+
+    def search(self, query, limit, offset=0):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return self.backend.search(terms, limit, offset)
+
+    def rebuild(self):
+        backend = self.backend
+        backend.clear()
+        count = 0
+        for course_id, document in _iter_documents():
+            backend.upsert(course_id, document)
+            count += 1
+        db.session.commit()
+        return count
+
+
+search_index = SearchIndex()
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """
+    Dựng lại toàn bộ chỉ mục tìm kiếm từ bảng courses và cards.
+    """
+    count = search_index.rebuild()
+    click.echo(f"Indexed {count} course(s) using the {search_index.backend.name} backend")
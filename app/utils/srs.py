@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+# Tham số SM-2
+DEFAULT_EASE = 2500  # x1000
+MIN_EASE = 1300
+PASSING_GRADE = 3
+MAX_GRADE = 5
+
+
+def schedule_review(state, grade, reviewed_at):
+    """
+    Tính trạng thái kế tiếp theo SM-2. state là dict gồm interval, ease, reps, lapses
+    (dict mới được trả về, state không bị sửa). grade từ 0 (quên hẳn) tới 5 (nhớ ngay).
+    """
+    interval = state.get("interval") or 0
+    ease = state.get("ease") or DEFAULT_EASE
+    reps = state.get("reps") or 0
+    lapses = state.get("lapses") or 0
+
+    if grade < PASSING_GRADE:
+        reps = 0
+        interval = 1
+        lapses += 1
+    else:
+        if reps == 0:
+            interval = 1
+        elif reps == 1:
+            interval = 6
+        else:
+            interval = max(interval + 1, round(interval * ease / 1000))
+        reps += 1
+
+    miss = MAX_GRADE - grade
+    ease = max(MIN_EASE, ease + 100 - miss * (80 + miss * 20))
+
+    return {
+        "interval": interval,
+        "ease": ease,
+        "reps": reps,
+        "lapses": lapses,
+        "due_at": reviewed_at + timedelta(days=interval),
+        "last_reviewed_at": reviewed_at,
+    }
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+
+
+def stream_json_array(rows, serialize, headers=None):
+    """
+    Trả về một mảng JSON dưới dạng stream: mỗi phần tử được serialize và gửi đi
+    ngay khi đọc được, không dựng toàn bộ list trong bộ nhớ.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield "["
+        first = True
+        for row in rows:
+            if not first:
+                yield ","
+            first = False
+            yield dumps(serialize(row))
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json", headers=headers)
+
+
+def parse_since_arg(request):
+    """
+    Đọc tham số ?since= (ISO 8601). Trả về (datetime | None, lỗi | None).
+    """
+    raw = request.args.get("since")
+    if not raw:
+        return None, None
+    try:
+        return datetime.fromisoformat(raw), None
+    except ValueError:
+        return None, "Invalid 'since' parameter, expected ISO 8601 datetime"
+
+
+def parse_page_args(request, default_size, max_size):
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = request.args.get("per_page", default_size, type=int)
+    per_page = max(1, min(per_page, max_size))
+    return page, per_page
@@ -0,0 +1,161 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow là tùy chọn: thiếu thì chỉ phục vụ ảnh gốc
+    Image = None
+
+VARIANT_DIR = "variants"
+
+# Định dạng Pillow ghi lại được cho bản thu nhỏ cùng định dạng với ảnh gốc
+_SAVE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".gif": "GIF", ".webp": "WEBP"}
+
+
+class ThumbnailPipeline:
+    """
+    Sinh ảnh thu nhỏ theo các độ rộng cố định (kèm bản WebP) trong một worker pool ngay
+    sau khi upload. Các bản này được cache trên đĩa, loại bỏ theo LRU khi vượt giới hạn dung lượng.
+    """
+
+    def __init__(self):
+        self.widths = ()
+        self.webp = True
+        self.max_bytes = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._original_widths = {}
+
+    @property
+    def enabled(self):
+        return Image is not None and bool(self.widths)
+
+    def init_app(self, app):
+        self.widths = tuple(sorted(app.config.get("THUMBNAIL_WIDTHS", ())))
+        self.webp = app.config.get("THUMBNAIL_WEBP", True)
+        self.max_bytes = app.config.get("THUMBNAIL_CACHE_MAX_BYTES", 0)
+        if self.enabled and self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config.get("THUMBNAIL_WORKERS", 2),
+                thread_name_prefix="thumbnails",
+            )
+
+    @staticmethod
+    def _variant_name(filename, width, webp):
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}-{width}{'.webp' if webp else ext}"
+
+    def schedule(self, filename):
+        """
+        Đưa việc sinh ảnh thu nhỏ của một file vừa upload vào worker pool.
+        """
+        if not self.enabled or os.path.splitext(filename)[1].lower() not in _SAVE_FORMATS:
+            return None
+        with self._lock:
+            if filename in self._pending:
+                return None
+            self._pending.add(filename)
+        upload_folder = current_app.config["UPLOAD_FOLDER"]
+        logger = current_app.logger
+        return self._executor.submit(self._generate, upload_folder, filename, logger)
+
+    def _generate(self, upload_folder, filename, logger):
+        try:
+            self._render(upload_folder, filename, logger)
+        finally:
+            with self._lock:
+                self._pending.discard(filename)
+
+    def _render(self, upload_folder, filename, logger):
+        source = os.path.join(upload_folder, filename)
+        variant_dir = os.path.join(upload_folder, VARIANT_DIR)
+        os.makedirs(variant_dir, exist_ok=True)
+        save_format = _SAVE_FORMATS[os.path.splitext(filename)[1].lower()]
+        try:
+            with Image.open(source) as original:
+                self._original_widths[filename] = original.width
+                for width in self.widths:
+                    # Không phóng to ảnh nhỏ hơn độ rộng yêu cầu
+                    if width >= original.width:
+                        break
+                    height = max(1, round(original.height * width / original.width))
+                    resized = original.resize((width, height), Image.LANCZOS)
+                    targets = [(self._variant_name(filename, width, False), save_format)]
+                    if self.webp and save_format != "WEBP":
+                        targets.append((self._variant_name(filename, width, True), "WEBP"))
+                    for name, fmt in targets:
+                        image = resized
+                        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+                            image = image.convert("RGB")
+                        # Ghi ra file tạm rồi đổi tên để không phục vụ file ghi dở
+                        tmp_path = os.path.join(variant_dir, "." + name)
+                        image.save(tmp_path, format=fmt)
+                        os.replace(tmp_path, os.path.join(variant_dir, name))
+        except Exception as e:
+            logger.error(f"Failed to generate thumbnails for {filename}: {str(e)}")
+            return
+        self._evict(variant_dir)
+
+    def _evict(self, variant_dir):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            entries = [entry for entry in os.scandir(variant_dir) if entry.is_file()]
+            total = sum(entry.stat().st_size for entry in entries)
+            if total <= self.max_bytes:
+                return
+            # mtime được cập nhật mỗi lần phục vụ, nên file cũ nhất là file ít dùng nhất
+            for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def find_variant(self, upload_folder, filename, width, accept_webp):
+        """
+        Tìm bản thu nhỏ gần nhất (nhỏ nhất mà vẫn >= width). Trả về (thư mục, tên file) hoặc None.
+        Nếu bản đó chưa có (chưa sinh xong hoặc đã bị loại khỏi cache) thì xếp lịch sinh lại.
+        """
+        if not self.enabled:
+            return None
+        variant_dir = os.path.join(upload_folder, VARIANT_DIR)
+        for candidate in self.widths:
+            if candidate < width:
+                continue
+            names = [self._variant_name(filename, candidate, False)]
+            if accept_webp:
+                names.insert(0, self._variant_name(filename, candidate, True))
+            for name in names:
+                path = os.path.join(variant_dir, name)
+                try:
+                    os.utime(path)  # Đánh dấu vừa được dùng (cho LRU)
+                except OSError:
+                    continue
+                return variant_dir, name
+            original_width = self._original_widths.get(filename)
+            if (original_width is None or candidate < original_width) and \
+                    os.path.exists(os.path.join(upload_folder, filename)):
+                self.schedule(filename)
+            return None
+        return None
+
+    def remove_variants(self, upload_folder, filename):
+        self._original_widths.pop(filename, None)
+        variant_dir = os.path.join(upload_folder, VARIANT_DIR)
+        for width in self.widths:
+            for webp in (False, True):
+                try:
+                    os.remove(os.path.join(variant_dir, self._variant_name(filename, width, webp)))
+                except FileNotFoundError:
+                    pass
+
+
+thumbnails = ThumbnailPipeline()
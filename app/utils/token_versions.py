@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from app.models import db, User
+
+# Đánh dấu user đã bị xóa: mọi token của user này đều bị từ chối
+REVOKED = -1
+
+
+class TokenVersionTable:
+    """
+    Bảng user_id -> token_version trong bộ nhớ (TTL + loại bỏ LRU). Token mang claim "tv";
+    token có tv khác phiên bản hiện tại bị từ chối mà không cần nạp user. Giá trị được đọc
+    lại từ DB sau TTL giây để các process khác cũng thấy thay đổi (khóa tài khoản, đổi quyền) sớm.
+    """
+
+    def __init__(self, ttl=30, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("TOKEN_VERSION_TTL", self.ttl)
+        self.maxsize = app.config.get("TOKEN_VERSION_MAXSIZE", self.maxsize)
+        with self._lock:
+            self._versions.clear()
+        if not event.contains(db.session, "after_commit", self._apply_after_commit):
+            event.listen(db.session, "after_commit", self._apply_after_commit)
+            event.listen(db.session, "after_soft_rollback", self._discard_after_rollback)
+
+    def _set(self, user_id, version):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._versions[user_id] = (version, time.monotonic() + self.ttl)
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.maxsize:
+                self._versions.popitem(last=False)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._versions.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._versions.move_to_end(user_id)
+                return entry[0]
+            if entry is not None:
+                del self._versions[user_id]
+        row = db.session.query(User.token_version).filter(User.id == user_id).first()
+        version = REVOKED if row is None else (row.token_version or 0)
+        self._set(user_id, version)
+        return version
+
+    def is_current(self, user_id, token_version):
+        version = self.get(user_id)
+        return version != REVOKED and version == token_version
+
+    def bump(self, user):
+        """
+        Tăng phiên bản token của user (không commit): mọi token đã cấp trước đó mất hiệu lực.
+        Bảng trong bộ nhớ chỉ được cập nhật khi transaction commit thành công.
+        """
+        user.token_version = (user.token_version or 0) + 1
+        db.session.info.setdefault("token_versions_pending", {})[user.id] = user.token_version
+
+    def revoke(self, user_id):
+        self._set(user_id, REVOKED)
+
+    def _apply_after_commit(self, session):
+        for user_id, version in session.info.pop("token_versions_pending", {}).items():
+            self._set(user_id, version)
+
+    def _discard_after_rollback(self, session, previous_transaction):
+        session.info.pop("token_versions_pending", None)
+
+
+token_versions = TokenVersionTable()
@@ -0,0 +1,306 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, select, update
+from werkzeug.utils import secure_filename
+
+from app.models import db, Course, Upload
+from app.utils.thumbnails import thumbnails
+from app.utils.file_serving import precompress, remove_precompressed
+
+URL_PREFIX = "uploads/"
+
+# Chữ ký đầu file của các định dạng ảnh; đuôi không có trong bảng thì chỉ kiểm tra đuôi
+_MAGIC_BYTES = {
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpg": (b"\xff\xd8\xff",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "gif": (b"GIF87a", b"GIF89a"),
+    "svg": (b"<?xml", b"<svg"),
+}
+MAGIC_BYTES_LENGTH = 16
+
+
+class UploadError(Exception):
+    """
+    Upload bị từ chối. status là mã HTTP trả về; details được đưa thêm vào body JSON.
+    """
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def _matches_magic(ext, head):
+    if ext == "webp":
+        return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+    signatures = _MAGIC_BYTES.get(ext)
+    if signatures is None:
+        return True
+    if ext == "svg":
+        head = head.lstrip()
+    return any(head.startswith(signature) for signature in signatures)
+
+
+def allowed_extension(filename):
+    """
+    Đuôi file (".png"...) nếu nằm trong ALLOWED_EXTENSIONS, ngược lại ném UploadError (415).
+    """
+    ext = _extension(filename)
+    if ext.lstrip(".") not in current_app.config["ALLOWED_EXTENSIONS"]:
+        raise UploadError(f"File type '{ext or filename}' is not allowed", 415)
+    return ext
+
+
+def check_magic(ext, head):
+    """
+    So vài byte đầu file với chữ ký của định dạng theo đuôi; không khớp thì ném UploadError (415).
+    """
+    if not _matches_magic(ext.lstrip("."), bytes(head[:MAGIC_BYTES_LENGTH])):
+        raise UploadError("File content does not match its type", 415)
+
+
+def _extension(filename):
+    _, ext = os.path.splitext(secure_filename(filename or ""))
+    return ext.lower()
+
+
+def _upload_name(image_path):
+    # "uploads/<name>" -> "<name>"
+    if not image_path:
+        return None
+    return os.path.basename(image_path)
+
+
+def _copy_and_hash(src, dst, chunk_size, ext, max_size):
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        if not size:
+            check_magic(ext, chunk)
+        size += len(chunk)
+        if size > max_size:
+            raise UploadError("File is too large", 413, max_size=max_size)
+        digest.update(chunk)
+        dst.write(chunk)
+    return digest.hexdigest(), size
+
+
+def save_upload(file_storage):
+    """
+    Ghi file upload xuống đĩa theo từng chunk, vừa ghi vừa băm SHA-256, rồi lưu dưới
+    tên <sha256><ext>. File trùng nội dung chỉ lưu một lần; tăng ref_count. Không commit.
+    Đuôi, chữ ký đầu file và UPLOAD_MAX_SIZE được kiểm tra trước khi ghi hết file (UploadError).
+    Trả về đường dẫn "uploads/<tên>" để gán cho Course.image.
+    """
+    ext = allowed_extension(file_storage.filename)
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    os.makedirs(upload_folder, exist_ok=True)
+    chunk_size = current_app.config["UPLOAD_CHUNK_SIZE"]
+
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            content_hash, size = _copy_and_hash(
+                file_storage.stream, tmp, chunk_size, ext, current_app.config["UPLOAD_MAX_SIZE"]
+            )
+        return store_file(tmp_path, content_hash + ext, size)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass  # Request khác vừa lưu cùng nội dung
+    except OSError:
+        # Ổ đĩa không hỗ trợ hard link: sao chép ra file tạm rồi đổi tên để không lộ file ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".upload-")
+        os.close(fd)
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+
+
+def store_file(tmp_path, filename, size, keep_source=False):
+    """
+    Đưa file đã ghi xong (cùng ổ đĩa với UPLOAD_FOLDER) vào kho theo hash bằng một lần đổi tên,
+    rồi tăng ref_count. Không commit. Trả về "uploads/<tên>".
+    File mới được xóa lại nếu transaction rollback; ảnh thu nhỏ chỉ được sinh sau khi commit.
+    keep_source=True: hard link thay vì đổi tên, file nguồn còn nguyên nếu transaction không
+    commit được; người gọi tự xóa nó sau khi commit.
+    """
+    final_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+    if os.path.exists(final_path):
+        if not keep_source:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+    else:
+        if keep_source:
+            _link_or_copy(tmp_path, final_path)
+        else:
+            os.replace(tmp_path, final_path)
+        precompress(final_path)
+        db.session.info.setdefault("uploads_created", set()).add(filename)
+    acquire(filename, size)
+    return URL_PREFIX + filename
+
+
+def acquire(filename, size=None):
+    """
+    Tăng số tham chiếu tới một file đã lưu (tạo bản ghi nếu chưa có). Không commit.
+    """
+    updated = db.session.execute(
+        update(Upload).where(Upload.filename == filename).values(ref_count=Upload.ref_count + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(Upload(filename=filename, size=size, ref_count=1))
+        db.session.flush()
+    _pending_unlinks().discard(filename)
+
+
+def release(image_path):
+    """
+    Giảm số tham chiếu; khi về 0 thì xóa bản ghi và xóa file sau khi commit thành công.
+    Cả hai bước là UPDATE / DELETE có điều kiện trên DB (như acquire), không đọc-sửa-ghi,
+    nên không đua với acquire chạy song song. Không commit.
+    File cũ chưa được quản lý bởi bảng uploads (ảnh tải lên trước đây) được giữ nguyên.
+    """
+    filename = _upload_name(image_path)
+    if not filename:
+        return
+    updated = db.session.execute(
+        update(Upload).where(Upload.filename == filename).values(ref_count=Upload.ref_count - 1)
+    ).rowcount
+    if not updated:
+        return
+    removed = db.session.execute(
+        delete(Upload).where(Upload.filename == filename, Upload.ref_count <= 0)
+    ).rowcount
+    if removed:
+        _pending_unlinks().add(filename)
+
+
+def _pending_unlinks():
+    return db.session.info.setdefault("uploads_to_unlink", set())
+
+
+def _remove_stored(upload_folder, filename):
+    path = os.path.join(upload_folder, filename)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        current_app.logger.error(f"Failed to remove upload {filename}: {str(e)}")
+    remove_precompressed(path)
+    thumbnails.remove_variants(upload_folder, filename)
+
+
+def _existing_uploads(filenames):
+    # Đọc bằng connection riêng: chỉ thấy các bản ghi đã commit
+    with db.engine.connect() as conn:
+        return set(conn.execute(
+            select(Upload.filename).where(Upload.filename.in_(filenames))
+        ).scalars())
+
+
+def _unlink_after_commit(session):
+    for filename in session.info.pop("uploads_created", ()):
+        thumbnails.schedule(filename)
+    filenames = session.info.pop("uploads_to_unlink", None)
+    if not filenames:
+        return
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    # Một acquire commit ngay sau có thể đã tạo lại bản ghi cho cùng file: khi đó giữ file
+    for filename in filenames - _existing_uploads(filenames):
+        _remove_stored(upload_folder, filename)
+
+
+def _discard_after_rollback(session):
+    session.info.pop("uploads_to_unlink", None)
+    created = session.info.pop("uploads_created", None)
+    if not created:
+        return
+    # File vừa lưu trong transaction bị hủy; giữ lại nếu request khác đã commit cùng nội dung
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    for filename in created - _existing_uploads(created):
+        _remove_stored(upload_folder, filename)
+
+
+def init_app(app):
+    event.listen(db.session, "after_commit", _unlink_after_commit)
+    event.listen(db.session, "after_soft_rollback", lambda session, previous: _discard_after_rollback(session))
+    app.cli.add_command(dedupe_uploads_command)
+
+
+@click.command("dedupe-uploads")
+@with_appcontext
+def dedupe_uploads_command():
+    """
+    Chuyển ảnh cũ (lưu theo tên gốc) sang kho theo hash nội dung và dựng lại ref_count.
+    """
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    chunk_size = current_app.config["UPLOAD_CHUNK_SIZE"]
+    managed = {u.filename for u in Upload.query.all()}
+    images = [
+        row.image for row in db.session.query(Course.image).filter(Course.image.isnot(None)).distinct()
+    ]
+
+    moved = 0
+    for image in images:
+        filename = _upload_name(image)
+        if filename in managed:
+            continue
+        path = os.path.join(upload_folder, filename)
+        if not os.path.isfile(path):
+            click.echo(f"Missing file for {image}, skipped")
+            continue
+        with open(path, "rb") as src:
+            digest = hashlib.sha256()
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        new_name = digest.hexdigest() + _extension(filename)
+        new_path = os.path.join(upload_folder, new_name)
+        if os.path.exists(new_path):
+            os.remove(path)
+        else:
+            os.replace(path, new_path)
+        Course.query.filter_by(image=image).update({"image": URL_PREFIX + new_name}, synchronize_session=False)
+        managed.add(new_name)
+        moved += 1
+
+    # Dựng lại ref_count từ số khóa học đang tham chiếu
+    counts = dict(
+        db.session.query(Course.image, func.count(Course.id))
+        .filter(Course.image.isnot(None))
+        .group_by(Course.image)
+        .all()
+    )
+    for filename in managed:
+        ref_count = counts.get(URL_PREFIX + filename, 0)
+        upload = db.session.get(Upload, filename)
+        if upload is None:
+            path = os.path.join(upload_folder, filename)
+            size = os.path.getsize(path) if os.path.exists(path) else None
+            db.session.add(Upload(filename=filename, size=size, ref_count=ref_count))
+        else:
+            upload.ref_count = ref_count
+    db.session.commit()
+    click.echo(f"Moved {moved} image(s) into the content-addressed store")
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Bản chụp gọn của User, chỉ gồm các trường mà route thực sự đọc từ current_user
+CachedUser = namedtuple("CachedUser", ["id", "role", "username"])
+
+
+class UserCache:
+    """
+    Cache danh tính người dùng theo user_id (TTL + loại bỏ LRU) cho token_required.
+    """
+
+    def __init__(self, ttl=60, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("USER_CACHE_TTL", self.ttl)
+        self.maxsize = app.config.get("USER_CACHE_MAXSIZE", self.maxsize)
+        self.clear()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user):
+        snapshot = CachedUser(id=user.id, role=user.role, username=user.username)
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return snapshot
+        with self._lock:
+            self._data[user.id] = (snapshot, time.monotonic() + self.ttl)
+            self._data.move_to_end(user.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+user_cache = UserCache()
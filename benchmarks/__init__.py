@@ -0,0 +1,3 @@
+"""
+Benchmark các endpoint chính trên dữ liệu sinh tất định (python -m benchmarks.run).
+"""
@@ -0,0 +1,97 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models import db, User, Course, Card, Favorite, StudyHistory
+from app.utils.cards import build_card_rows
+from app.utils.passwords import password_hasher
+from app.utils.rollups import add_to_rollups
+from app.utils.quiz_snapshots import build_snapshot, save_snapshot
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_USERNAME = "bench-admin"
+
+# Mốc thời gian cố định để dữ liệu giống hệt nhau giữa các lần chạy
+_EPOCH = datetime(2025, 1, 1)
+
+_WORDS = (
+    "toán", "lý", "hóa", "sinh", "sử", "địa", "văn", "anh", "python", "flask", "mạng", "dữ liệu",
+    "cấu trúc", "giải thuật", "thống kê", "xác suất", "kinh tế", "triết", "nhật", "pháp",
+)
+
+
+def _phrase(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _question(rng, index):
+    if rng.random() < 0.6:
+        options = [{"text": _phrase(rng, 2), "isCorrect": i == 0} for i in range(4)]
+        rng.shuffle(options)
+        return {"questionText": f"Câu {index}: {_phrase(rng, 6)}?", "type": "multipleChoice",
+                "options": options, "correctAnswer": ""}
+    return {"questionText": f"Câu {index}: {_phrase(rng, 6)} ___", "type": "fillInTheBlank",
+            "options": [], "correctAnswer": _phrase(rng, 1)}
+
+
+def _insert_chunked(model, rows, chunk_size=5000):
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(model), rows[start:start + chunk_size])
+
+
+def generate(users=200, courses=1000, cards=30, history=20, favorites=5, published_ratio=0.7, seed=42):
+    """
+    Sinh và bulk insert dữ liệu: một admin (bench-admin), users người dùng bench0..benchN-1,
+    courses khóa học chia đều cho các user, cards câu hỏi mỗi khóa, history lượt học và
+    favorites khóa yêu thích mỗi user. Cùng seed thì cùng dữ liệu. Trả về các id để dựng kịch bản.
+    """
+    rng = random.Random(seed)
+    # Băm một lần, dùng chung cho mọi user (băm từng user sẽ chiếm gần hết thời gian sinh dữ liệu)
+    password = password_hasher.hash(BENCH_PASSWORD)
+
+    user_rows = [{"id": 1, "username": ADMIN_USERNAME, "email": "admin@bench.local", "name": "Bench Admin",
+                  "password": password, "role": "ADMIN", "token_version": 0}]
+    for i in range(users):
+        user_rows.append({"id": i + 2, "username": f"bench{i}", "email": f"bench{i}@bench.local",
+                          "name": f"Bench User {i}", "password": password, "role": "USER", "token_version": 0})
+    _insert_chunked(User, user_rows)
+    user_ids = [row["id"] for row in user_rows[1:]]
+
+    course_rows = []
+    for i in range(courses):
+        created = _EPOCH + timedelta(minutes=i)
+        course_rows.append({
+            "id": i + 1, "name": f"Khóa {i}: {_phrase(rng, 3)}", "description": _phrase(rng, 12),
+            "owner_id": user_ids[i % len(user_ids)], "is_published": rng.random() < published_ratio,
+            "version": 1, "created_at": created, "updated_at": created,
+        })
+    _insert_chunked(Course, course_rows)
+    course_ids = [row["id"] for row in course_rows]
+
+    for course_id in course_ids:
+        rows = build_card_rows(course_id, [_question(rng, n) for n in range(cards)])
+        db.session.execute(insert(Card), rows)
+
+    history_rows, favorite_rows = [], []
+    for user_id in user_ids:
+        for n in range(history):
+            history_rows.append({"user_id": user_id, "course_id": rng.choice(course_ids),
+                                 "studied_at": _EPOCH + timedelta(hours=rng.randrange(24 * 365))})
+        for course_id in rng.sample(course_ids, min(favorites, len(course_ids))):
+            favorite_rows.append({"user_id": user_id, "course_id": course_id,
+                                  "created_at": _EPOCH + timedelta(hours=rng.randrange(24 * 365))})
+    _insert_chunked(StudyHistory, history_rows)
+    add_to_rollups(history_rows)
+    _insert_chunked(Favorite, favorite_rows)
+
+    # Quiz đã xuất bản luôn có snapshot (publish tạo ra nó)
+    for course in Course.query.filter_by(is_published=True):
+        save_snapshot(build_snapshot(course))
+    db.session.commit()
+
+    return {
+        "admin_id": 1,
+        "user_ids": user_ids,
+        "courses": [(row["id"], row["owner_id"], row["is_published"]) for row in course_rows],
+    }
@@ -0,0 +1,239 @@
+"""
+Chạy benchmark các endpoint chính trên SQLite với dữ liệu sinh tất định, in p50/p95/p99 và số
+truy vấn mỗi request, rồi so với baseline. Thoát với mã 1 nếu có hồi quy.
+Số truy vấn không phụ thuộc máy nên luôn được so; độ trễ tuyệt đối chỉ so được với baseline ghi
+trên cùng máy nên chỉ kiểm tra khi có --check-latency.
+
+    python -m benchmarks.run                      # so với benchmarks/baseline.json
+    python -m benchmarks.run --check-latency      # so cả p95 (baseline ghi trên máy này)
+    python -m benchmarks.run --save-baseline      # ghi kết quả hiện tại làm baseline
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Chênh lệch độ trễ nhỏ hơn mức này (ms) coi là nhiễu, không tính là hồi quy
+LATENCY_NOISE_MS = 2.0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the hot API endpoints.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--courses", type=int, default=1000)
+    parser.add_argument("--cards", type=int, default=30, help="cards per course")
+    parser.add_argument("--history", type=int, default=20, help="study history rows per user")
+    parser.add_argument("--favorites", type=int, default=5, help="favorites per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per endpoint")
+    parser.add_argument("--login-requests", type=int, default=30, help="measured /login requests (CPU-bound)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check-latency", action="store_true",
+                        help="also fail on p95 regressions (only meaningful against a baseline from the same machine)")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="with --check-latency, fail when p95 exceeds baseline p95 times this factor")
+    parser.add_argument("--only", action="append", help="run only the named scenario (repeatable)")
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_scenarios(data, args, tokens):
+    """
+    Mỗi kịch bản là hàm i -> (method, url, kwargs), xoay vòng qua dữ liệu theo thứ tự cố định.
+    """
+    from benchmarks.datagen import BENCH_PASSWORD
+
+    published = [course_id for course_id, _, is_published in data["courses"] if is_published]
+    owned = [(course_id, owner_id) for course_id, owner_id, _ in data["courses"]]
+    users = data["user_ids"]
+    admin_headers = {"Authorization": f"Bearer {tokens[data['admin_id']]}"}
+    pages = max(1, args.users // 50)
+
+    def public_courses(i):
+        # Trang đầu (có cache) xen kẽ các trang keyset sâu hơn
+        if i % 2 == 0:
+            return "GET", "/api/courses/public", {}
+        return "GET", f"/api/courses/public?after_id={published[(i * 7) % len(published)]}", {}
+
+    def quiz_questions(i):
+        return "GET", f"/api/public/quiz/{published[(i * 13) % len(published)]}/questions", {}
+
+    def course_detail(i):
+        course_id, owner_id = owned[(i * 17) % len(owned)]
+        return "GET", f"/api/courses/{course_id}", {"headers": {"Authorization": f"Bearer {tokens[owner_id]}"}}
+
+    def admin_dashboard(i):
+        return "GET", f"/api/admin/dashboard-data?page={i % pages + 1}", {"headers": admin_headers}
+
+    def login(i):
+        username = f"bench{(i * 11) % len(users)}"
+        return "POST", "/api/auth/login", {"json": {"username": username, "password": BENCH_PASSWORD}}
+
+    return {
+        "public_courses": (public_courses, args.requests),
+        "quiz_questions": (quiz_questions, args.requests),
+        "course_detail": (course_detail, args.requests),
+        "admin_dashboard": (admin_dashboard, args.requests),
+        "login": (login, args.login_requests),
+    }
+
+
+def run_scenario(client, counter, make_request, iterations, warmup):
+    for i in range(warmup):
+        method, url, kwargs = make_request(i)
+        client.open(url, method=method, **kwargs)
+
+    latencies, queries, errors = [], [], 0
+    for i in range(warmup, warmup + iterations):
+        method, url, kwargs = make_request(i)
+        counter["queries"] = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter["queries"])
+        if response.status_code >= 400:
+            errors += 1
+
+    latencies.sort()
+    return {
+        "requests": iterations,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries_mean": round(sum(queries) / len(queries), 2) if queries else 0,
+        "queries_max": max(queries) if queries else 0,
+    }
+
+
+def compare(results, baseline, tolerance, check_latency=False):
+    """
+    Trả về danh sách hồi quy. Số truy vấn là tất định nên chỉ cần tăng (max hoặc trung bình)
+    là hồi quy; độ trễ p95 chỉ được so khi check_latency, trong hệ số tolerance.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {result['errors']} error responses (baseline {base.get('errors', 0)})")
+        if result["queries_max"] > base["queries_max"]:
+            regressions.append(f"{name}: up to {result['queries_max']} queries/request (baseline {base['queries_max']})")
+        elif result["queries_mean"] > base["queries_mean"] + 1e-9:
+            regressions.append(f"{name}: {result['queries_mean']:.2f} queries/request on average "
+                               f"(baseline {base['queries_mean']:.2f})")
+        if not check_latency:
+            continue
+        limit = base["p95_ms"] * tolerance
+        if result["p95_ms"] > limit and result["p95_ms"] - base["p95_ms"] > LATENCY_NOISE_MS:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms > {limit:.1f} ms "
+                               f"(baseline {base['p95_ms']:.1f} ms x {tolerance})")
+    return regressions
+
+
+def print_report(results, baseline):
+    header = f"{'scenario':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/req':>8}{'q max':>7}{'errors':>8}{'base p95':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        base = baseline.get("scenarios", {}).get(name, {}) if baseline else {}
+        base_p95 = f"{base['p95_ms']:.2f}" if "p95_ms" in base else "-"
+        print(f"{name:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['queries_mean']:>8.1f}{r['queries_max']:>7}{r['errors']:>8}{base_p95:>10}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Cấu hình phải có trước khi import app (TestingConfig đọc biến môi trường lúc import)
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["TEST_DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.auth import generate_token
+    from app.models import User
+    from app.utils.rate_limit import rate_limiter
+    from benchmarks.datagen import generate
+
+    app = create_app("testing")
+    app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    app.logger.setLevel(logging.ERROR)
+    rate_limiter.enabled = False  # /login được gọi liên tục từ một IP
+
+    params = {key: getattr(args, key) for key in ("users", "courses", "cards", "history", "favorites", "seed")}
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        data = generate(users=args.users, courses=args.courses, cards=args.cards,
+                        history=args.history, favorites=args.favorites, seed=args.seed)
+        print(f"Generated data in {time.perf_counter() - started:.1f}s: {params}")
+        tokens = {user.id: generate_token(user) for user in User.query.all()}
+        db.session.remove()
+
+        counter = {"queries": 0}
+
+        def count_query(*_):
+            counter["queries"] += 1
+        event.listen(db.engine, "before_cursor_execute", count_query)
+
+        client = app.test_client()
+        scenarios = build_scenarios(data, args, tokens)
+        results = {}
+        for name, (make_request, iterations) in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = run_scenario(client, counter, make_request, iterations, args.warmup)
+        db.engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print()
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "scenarios": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    if baseline.get("params") != params:
+        print(f"\nWARNING: baseline was recorded with {baseline.get('params')}, "
+              "comparison may not be meaningful.")
+
+    regressions = compare(results, baseline, args.tolerance, args.check_latency)
+    if regressions:
+        print("\n!!! PERFORMANCE REGRESSION !!!")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""add (is_published, id) index on courses
+
+Revision ID: a1c3e5f7b902
+Revises: f5e786b07df7
+Create Date: 2026-10-18 09:12:44.102311
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f7b902'
+down_revision = 'f5e786b07df7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.create_index('ix_courses_is_published_id', ['is_published', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_index('ix_courses_is_published_id')
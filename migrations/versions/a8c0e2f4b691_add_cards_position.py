@@ -0,0 +1,30 @@
+"""add cards.position for question order
+
+Revision ID: a8c0e2f4b691
+Revises: b4d6f8a0c235
+Create Date: 2026-10-18 20:14:52.730418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c0e2f4b691'
+down_revision = 'b4d6f8a0c235'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_cards_course_id_position', ['course_id', 'position'], unique=False)
+    # Giữ thứ tự hiện tại (theo id) cho card đã có
+    op.execute("UPDATE cards SET position = id")
+
+
+def downgrade():
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.drop_index('ix_cards_course_id_position')
+        batch_op.drop_column('position')
@@ -0,0 +1,34 @@
+"""add history/favorites listing indexes and favorites.created_at
+
+Revision ID: b2d4f6a8c013
+Revises: a1c3e5f7b902
+Create Date: 2026-10-18 10:03:17.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c013'
+down_revision = 'a1c3e5f7b902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_favorites_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('study_history', schema=None) as batch_op:
+        batch_op.create_index('ix_study_history_user_id_studied_at', ['user_id', 'studied_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('study_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_study_history_user_id_studied_at')
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorites_user_id')
+        batch_op.drop_column('created_at')
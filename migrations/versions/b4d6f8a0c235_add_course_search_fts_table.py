@@ -0,0 +1,57 @@
+"""add course_search FTS5 table (SQLite only)
+
+Revision ID: b4d6f8a0c235
+Revises: f3b5d7e9a124
+Create Date: 2026-10-18 19:40:27.318902
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.search import FIELD_WEIGHTS, tokenize
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c235'
+down_revision = 'f3b5d7e9a124'
+branch_labels = None
+depends_on = None
+
+
+def _fts5_available(bind):
+    return bind.dialect.name == 'sqlite' and bool(
+        bind.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar()
+    )
+
+
+def upgrade():
+    # Chỉ mục tìm kiếm chỉ dùng FTS5 trên SQLite; CSDL khác dùng chỉ mục trong bộ nhớ
+    bind = op.get_bind()
+    if not _fts5_available(bind):
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE course_search USING fts5("
+        "name, description, cards, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+    # Nạp các khóa học hiện có, nội dung ở dạng đã tokenize() như Fts5Backend.upsert
+    fronts = defaultdict(list)
+    for course_id, front in bind.execute(sa.text("SELECT course_id, front FROM cards ORDER BY id")):
+        if front:
+            fronts[course_id].append(front)
+    rows = []
+    for course_id, name, description in bind.execute(sa.text("SELECT id, name, description FROM courses")):
+        document = {"name": name or "", "description": description or "", "cards": "\n".join(fronts.pop(course_id, ()))}
+        rows.append({"id": course_id, **{field: " ".join(tokenize(document[field])) for field in FIELD_WEIGHTS}})
+    if rows:
+        bind.execute(
+            sa.text("INSERT INTO course_search (rowid, name, description, cards) VALUES (:id, :name, :description, :cards)"),
+            rows,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS course_search")
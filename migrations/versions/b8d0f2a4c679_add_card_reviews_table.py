@@ -0,0 +1,43 @@
+"""add card_reviews table for spaced repetition
+
+Revision ID: b8d0f2a4c679
+Revises: a7c9e1f3b568
+Create Date: 2026-10-18 14:25:03.660412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c679'
+down_revision = 'a7c9e1f3b568'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('card_reviews',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('card_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('due_at', sa.DateTime(), nullable=False),
+    sa.Column('interval', sa.Integer(), nullable=False),
+    sa.Column('ease', sa.SmallInteger(), nullable=False),
+    sa.Column('reps', sa.SmallInteger(), nullable=False),
+    sa.Column('lapses', sa.SmallInteger(), nullable=False),
+    sa.Column('last_reviewed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['card_id'], ['cards.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'card_id')
+    )
+    with op.batch_alter_table('card_reviews', schema=None) as batch_op:
+        batch_op.create_index('ix_card_reviews_user_id_due_at', ['user_id', 'due_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('card_reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_card_reviews_user_id_due_at')
+
+    op.drop_table('card_reviews')
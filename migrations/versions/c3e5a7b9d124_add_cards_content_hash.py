@@ -0,0 +1,29 @@
+"""add cards.content_hash for diff publishing
+
+Revision ID: c3e5a7b9d124
+Revises: b2d4f6a8c013
+Create Date: 2026-10-18 10:41:05.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d124'
+down_revision = 'b2d4f6a8c013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Card cũ để NULL, hash được tính lại khi publish kiểu diff
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=40), nullable=True))
+        batch_op.create_index('ix_cards_course_id_content_hash', ['course_id', 'content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.drop_index('ix_cards_course_id_content_hash')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,45 @@
+"""add study_daily_rollups table and backfill it from study_history
+
+Revision ID: d0f2a4b6c891
+Revises: c9e1a3b5d780
+Create Date: 2026-10-18 15:40:27.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0f2a4b6c891'
+down_revision = 'c9e1a3b5d780'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('study_daily_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'course_id', 'day')
+    )
+    with op.batch_alter_table('study_daily_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_study_daily_rollups_user_id_day', ['user_id', 'day'], unique=False)
+
+    # Gộp toàn bộ lịch sử hiện có; từ đây mỗi lô ghi study_history cũng cập nhật rollup
+    op.execute(
+        "INSERT INTO study_daily_rollups (user_id, course_id, day, events) "
+        "SELECT user_id, course_id, DATE(studied_at), COUNT(*) FROM study_history "
+        "WHERE studied_at IS NOT NULL "
+        "GROUP BY user_id, course_id, DATE(studied_at)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('study_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_study_daily_rollups_user_id_day')
+
+    op.drop_table('study_daily_rollups')
@@ -0,0 +1,82 @@
+"""add structured question columns to cards and backfill from back JSON
+
+Revision ID: d4f6b8c0e235
+Revises: c3e5a7b9d124
+Create Date: 2026-10-18 11:20:48.630157
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c0e235'
+down_revision = 'c3e5a7b9d124'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('question_type', sa.String(length=30), nullable=True))
+        batch_op.add_column(sa.Column('options', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('correct_answer', sa.Text(), nullable=True))
+        batch_op.create_index('ix_cards_course_id_question_type', ['course_id', 'question_type'], unique=False)
+
+    # Backfill từ chuỗi JSON trong cột 'back', theo từng lô id
+    bind = op.get_bind()
+    cards = sa.table(
+        'cards',
+        sa.column('id', sa.Integer),
+        sa.column('back', sa.Text),
+        sa.column('question_type', sa.String),
+        sa.column('options', sa.JSON),
+        sa.column('correct_answer', sa.Text),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(cards.c.id, cards.c.back)
+            .where(cards.c.id > last_id)
+            .order_by(cards.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            try:
+                data = json.loads(row.back) if row.back else {}
+            except ValueError:
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            updates.append({
+                'card_id': row.id,
+                'question_type': data.get('type'),
+                'options': data.get('options', []),
+                'correct_answer': data.get('correctAnswer', ''),
+            })
+        bind.execute(
+            cards.update()
+            .where(cards.c.id == sa.bindparam('card_id'))
+            .values(
+                question_type=sa.bindparam('question_type'),
+                options=sa.bindparam('options', type_=sa.JSON),
+                correct_answer=sa.bindparam('correct_answer'),
+            ),
+            updates,
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('cards', schema=None) as batch_op:
+        batch_op.drop_index('ix_cards_course_id_question_type')
+        batch_op.drop_column('correct_answer')
+        batch_op.drop_column('options')
+        batch_op.drop_column('question_type')
@@ -0,0 +1,40 @@
+"""add quiz_snapshots table
+
+Revision ID: e2a4c6e8f013
+Revises: d0f2a4b6c891
+Create Date: 2026-10-18 16:52:09.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a4c6e8f013'
+down_revision = 'd0f2a4b6c891'
+branch_labels = None
+depends_on = None
+
+
+def _blob():
+    return sa.LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql')
+
+
+def upgrade():
+    # Không backfill: snapshot của quiz đã xuất bản được tạo ở lần đọc đầu tiên
+    op.create_table('quiz_snapshots',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('details', _blob(), nullable=False),
+    sa.Column('details_gzip', _blob(), nullable=False),
+    sa.Column('questions', _blob(), nullable=False),
+    sa.Column('questions_gzip', _blob(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+
+
+def downgrade():
+    op.drop_table('quiz_snapshots')
@@ -0,0 +1,25 @@
+"""add unique (user_id, course_id) constraint on progress
+
+Revision ID: e5a7c9d1f346
+Revises: d4f6b8c0e235
+Create Date: 2026-10-18 12:02:31.774090
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d1f346'
+down_revision = 'd4f6b8c0e235'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('progress', schema=None) as batch_op:
+        batch_op.create_unique_constraint('_progress_user_course_uc', ['user_id', 'course_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('progress', schema=None) as batch_op:
+        batch_op.drop_constraint('_progress_user_course_uc', type_='unique')
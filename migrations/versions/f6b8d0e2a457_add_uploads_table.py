@@ -0,0 +1,31 @@
+"""add uploads table for content-addressed images
+
+Revision ID: f6b8d0e2a457
+Revises: e5a7c9d1f346
+Create Date: 2026-10-18 12:48:09.401276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e2a457'
+down_revision = 'e5a7c9d1f346'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Ảnh cũ được chuyển sang kho theo hash bằng lệnh: flask dedupe-uploads
+    op.create_table('uploads',
+    sa.Column('filename', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('filename')
+    )
+
+
+def downgrade():
+    op.drop_table('uploads')
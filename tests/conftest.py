@@ -0,0 +1,54 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.auth import generate_token
+from app.models import User, Course
+from app.utils.user_cache import user_cache
+from app.utils.token_versions import token_versions
+from app.utils.history_buffer import history_buffer
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    app = create_app("testing")
+    app.config["UPLOAD_FOLDER"] = str(tmp_path_factory.mktemp("uploads"))
+    # SQLite trong bộ nhớ chỉ thấy được từ thread của test: test tự gọi history_buffer.flush()
+    history_buffer.flush_interval = 3600
+    return app
+
+
+@pytest.fixture
+def client(app):
+    # Mỗi test một DB SQLite trong bộ nhớ mới; cache theo user_id phải được xóa vì id bị dùng lại
+    user_cache.init_app(app)
+    token_versions.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def make_user(client):
+    """
+    Tạo user và trả về (id, header Authorization).
+    """
+    def make(username, role="USER"):
+        user = User(username=username, email=f"{username}@example.com",
+                    password=generate_password_hash("pw"), role=role)
+        db.session.add(user)
+        db.session.commit()
+        return user.id, {"Authorization": "Bearer " + generate_token(user)}
+    return make
+
+
+@pytest.fixture
+def make_course(client):
+    def make(owner_id, name="Course", is_published=True):
+        course = Course(name=name, owner_id=owner_id, is_published=is_published)
+        db.session.add(course)
+        db.session.commit()
+        return course.id
+    return make
@@ -0,0 +1,68 @@
+from app.models import db, Course, Favorite, StudyHistory, StudyRollup, User
+from app.utils.history_buffer import history_buffer
+
+
+def test_delete_favorited_course(client, make_user, make_course):
+    owner_id, owner = make_user("owner")
+    _, fan = make_user("fan")
+    course_id = make_course(owner_id)
+    assert client.post("/api/favorites", json={"course_id": course_id}, headers=fan).status_code == 200
+
+    response = client.delete(f"/api/courses/{course_id}", headers=owner)
+
+    assert response.status_code == 200
+    assert db.session.get(Course, course_id) is None
+    assert Favorite.query.count() == 0
+
+
+def test_admin_delete_user_with_favorites(client, make_user, make_course):
+    _, admin = make_user("admin", role="ADMIN")
+    user_id, user = make_user("user")
+    other_id, other = make_user("other")
+    own_course = make_course(user_id)
+    other_course = make_course(other_id)
+    # user thích khóa học của người khác, người khác thích khóa học của user
+    client.post("/api/favorites", json={"course_id": other_course}, headers=user)
+    client.post("/api/favorites", json={"course_id": own_course}, headers=other)
+
+    response = client.delete(f"/api/admin/users/{user_id}", headers=admin)
+
+    assert response.status_code == 200
+    assert db.session.get(User, user_id) is None
+    assert db.session.get(Course, own_course) is None
+    assert Favorite.query.count() == 0
+
+
+def _study(client, headers, course_id):
+    assert client.post("/api/history", json={"course_id": course_id}, headers=headers).status_code == 202
+    history_buffer.flush()
+
+
+def test_delete_studied_course(client, make_user, make_course):
+    owner_id, owner = make_user("owner")
+    _, learner = make_user("learner")
+    course_id = make_course(owner_id)
+    _study(client, learner, course_id)
+    assert StudyHistory.query.count() == 1 and StudyRollup.query.count() == 1
+
+    response = client.delete(f"/api/courses/{course_id}", headers=owner)
+
+    assert response.status_code == 200
+    assert StudyHistory.query.count() == 0
+    assert StudyRollup.query.count() == 0
+
+
+def test_admin_delete_user_with_history(client, make_user, make_course):
+    _, admin = make_user("admin", role="ADMIN")
+    user_id, user = make_user("user")
+    other_id, other = make_user("other")
+    own_course = make_course(user_id)
+    other_course = make_course(other_id)
+    _study(client, user, other_course)
+    _study(client, other, own_course)
+
+    response = client.delete(f"/api/admin/users/{user_id}", headers=admin)
+
+    assert response.status_code == 200
+    assert StudyHistory.query.count() == 0
+    assert StudyRollup.query.count() == 0
@@ -0,0 +1,19 @@
+from app.utils.history_buffer import history_buffer
+
+
+def test_record_history_rejects_when_buffer_full(client, make_user, make_course):
+    user_id, user = make_user("user")
+    courses = [make_course(user_id, name=f"Course {i}") for i in range(3)]
+    history_buffer.max_pending = 2
+    dropped = history_buffer.dropped
+    try:
+        statuses = [
+            client.post("/api/history", json={"course_id": course_id}, headers=user).status_code
+            for course_id in courses
+        ]
+        assert statuses == [202, 202, 503]
+        assert history_buffer.dropped == dropped + 1
+        assert history_buffer.stats()["pending"] == 2
+    finally:
+        history_buffer.max_pending = client.application.config["HISTORY_MAX_PENDING"]
+        history_buffer.flush()
@@ -0,0 +1,27 @@
+import pytest
+
+from app.utils.passwords import password_hasher
+
+
+@pytest.fixture
+def use_method(app):
+    original = app.config["PASSWORD_HASH_METHOD"]
+
+    def use(method):
+        app.config["PASSWORD_HASH_METHOD"] = method
+        password_hasher.init_app(app)
+    yield use
+    use(original)
+
+
+@pytest.mark.parametrize("method", ["scrypt", "pbkdf2:sha256", "pbkdf2:sha256:600000"])
+def test_alias_methods_do_not_force_rehash(use_method, method):
+    use_method(method)
+    pwhash = password_hasher.hash("secret")
+    assert password_hasher.verify(pwhash, "secret")
+    assert not password_hasher.needs_rehash(pwhash)
+
+
+def test_other_method_needs_rehash(use_method):
+    use_method("scrypt")
+    assert password_hasher.needs_rehash("pbkdf2:sha256:600000$salt$hash")
@@ -0,0 +1,39 @@
+def _question(text):
+    return {"questionText": text, "type": "fillInTheBlank", "correctAnswer": "a"}
+
+
+def _publish(client, headers, course_id, texts, mode="replace"):
+    response = client.post(f"/api/courses/{course_id}/publish?mode={mode}",
+                           json={"questions": [_question(t) for t in texts]}, headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json["changes"]
+
+
+def _cards(client, headers, course_id):
+    return [(card["front"], card["id"]) for card in client.get(f"/api/courses/{course_id}/cards", headers=headers).json]
+
+
+def test_diff_publish_keeps_question_order(client, make_user, make_course):
+    owner_id, owner = make_user("owner")
+    course_id = make_course(owner_id, is_published=False)
+    _publish(client, owner, course_id, ["A", "B", "C"])
+    ids = dict(_cards(client, owner, course_id))
+
+    changes = _publish(client, owner, course_id, ["C", "A", "X", "B"], mode="diff")
+
+    cards = _cards(client, owner, course_id)
+    assert [front for front, _ in cards] == ["C", "A", "X", "B"]
+    # Câu hỏi giữ nguyên nội dung giữ nguyên id
+    assert all(ids[front] == card_id for front, card_id in cards if front in ids)
+    assert changes == {"inserted": 1, "updated": 3, "deleted": 0, "unchanged": 0}
+
+
+def test_diff_publish_counts_unchanged(client, make_user, make_course):
+    owner_id, owner = make_user("owner")
+    course_id = make_course(owner_id, is_published=False)
+    _publish(client, owner, course_id, ["A", "B", "C"])
+
+    changes = _publish(client, owner, course_id, ["A", "B", "D"], mode="diff")
+
+    assert [front for front, _ in _cards(client, owner, course_id)] == ["A", "B", "D"]
+    assert changes == {"inserted": 1, "updated": 0, "deleted": 1, "unchanged": 2}
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from app.models import db, Card, CardReview
+
+
+def test_review_time_with_offset_is_stored_in_utc(client, make_user, make_course):
+    user_id, headers = make_user("learner")
+    course_id = make_course(user_id)
+    card = Card(course_id=course_id, front="Q", back="A")
+    db.session.add(card)
+    db.session.commit()
+    card_id = card.id
+
+    response = client.post("/api/study/reviews", headers=headers, json={
+        "reviews": [{"card_id": card_id, "grade": 5, "reviewed_at": "2026-03-01T09:30:00+07:00"}],
+    })
+
+    assert response.status_code == 200
+    review = db.session.get(CardReview, (user_id, card_id))
+    assert review.last_reviewed_at == datetime(2026, 3, 1, 2, 30)
+    assert review.due_at == datetime(2026, 3, 2, 2, 30)
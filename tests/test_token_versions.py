@@ -0,0 +1,29 @@
+from app.models import db, User
+from app.utils.token_versions import token_versions
+
+
+def test_bump_applies_only_after_commit(client, make_user):
+    user_id, _ = make_user("user")
+    assert token_versions.get(user_id) == 0
+
+    user = db.session.get(User, user_id)
+    token_versions.bump(user)
+    assert token_versions.get(user_id) == 0
+    db.session.rollback()
+    assert token_versions.get(user_id) == 0
+
+    user = db.session.get(User, user_id)
+    token_versions.bump(user)
+    db.session.commit()
+    assert token_versions.get(user_id) == 1
+
+
+def test_table_is_bounded(client, make_user):
+    token_versions.maxsize = 2
+    try:
+        ids = [make_user(f"user{i}")[0] for i in range(3)]
+        for user_id in ids:
+            token_versions.get(user_id)
+        assert list(token_versions._versions) == ids[1:]
+    finally:
+        token_versions.maxsize = client.application.config["TOKEN_VERSION_MAXSIZE"]
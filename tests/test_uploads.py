@@ -0,0 +1,67 @@
+import fcntl
+import io
+import os
+
+from app.models import db, Course, Upload
+from app.utils.chunked_uploads import partial_path
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def _create_course(client, headers, content):
+    data = {"name": "Course", "image": (io.BytesIO(content), "cover.png")}
+    return client.post("/api/courses", data=data, headers=headers, content_type="multipart/form-data")
+
+
+def _stored_files(client):
+    folder = client.application.config["UPLOAD_FOLDER"]
+    return {name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name))}
+
+
+def test_stored_file_removed_on_rollback(client, make_user, monkeypatch):
+    _, user = make_user("user")
+    before = _stored_files(client)
+
+    def fail():
+        raise RuntimeError("commit failed")
+    monkeypatch.setattr(db.session, "commit", fail)
+    response = _create_course(client, user, PNG + b"rollback")
+    monkeypatch.undo()
+
+    assert response.status_code == 500
+    assert Course.query.count() == 0 and Upload.query.count() == 0
+    assert _stored_files(client) == before
+
+
+def test_stored_file_kept_on_commit(client, make_user):
+    _, user = make_user("user")
+    before = _stored_files(client)
+
+    response = _create_course(client, user, PNG + b"commit")
+
+    assert response.status_code == 201
+    upload = Upload.query.one()
+    assert _stored_files(client) - before == {upload.filename}
+
+
+def _put_chunk(client, headers, upload_id, offset, body):
+    return client.put(f"/api/uploads/{upload_id}?offset={offset}", data=body, headers=headers)
+
+
+def test_chunk_rejected_while_another_is_written(client, make_user):
+    _, user = make_user("user")
+    content = PNG + b"chunked"
+    upload = client.post("/api/uploads", json={"filename": "cover.png", "size": len(content)}, headers=user).json
+
+    # Một PUT khác của cùng phiên đang giữ khóa file tạm
+    with client.application.test_request_context():
+        path = partial_path(upload["id"])
+    with open(path, "ab") as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        response = _put_chunk(client, user, upload["id"], 0, content[:32])
+        assert response.status_code == 409
+    assert os.path.getsize(path) == 0
+
+    assert _put_chunk(client, user, upload["id"], 0, content[:32]).json["offset"] == 32
+    assert _put_chunk(client, user, upload["id"], 0, content[:32]).status_code == 409
+    assert _put_chunk(client, user, upload["id"], 32, content[32:]).json["offset"] == len(content)